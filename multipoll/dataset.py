@@ -0,0 +1,165 @@
+from __future__ import annotations  # noqa: T484
+
+import io
+import random
+import time
+from typing import Any, Iterable, List, Optional, Tuple, Type
+
+from django.db import connection, models, transaction
+
+import numpy as np
+
+from multipoll.electoralsystems.benchmark import MAX_WEIGHT
+from multipoll.electoralsystems.benchmark import generate_weights
+from multipoll.models import PollBase, User
+
+# Synthetic polls written straight to the tables, for benchmarking the database and the views
+# at production sizes. Nothing is posted to Slack and no versions are bumped, the polls look
+# like ones whose votes all arrived before anything was cached.
+
+METHODS = ("copy", "bulk")
+BULK_BATCH_SIZE = 2000
+CHANNEL = "SYNTHETIC"
+USER_PREFIX = "synthetic-voter-"
+
+
+def _is_approval(poll_model: Type[PollBase]) -> bool:
+    return issubclass(getattr(poll_model, "WeightFieldType"), models.BooleanField)
+
+
+def _poll_seed(seed: int, index: int) -> int:
+    return seed * 1000003 + index
+
+
+def poll_ballots(poll_model: Type[PollBase], distribution: str, voters: int, options: int,
+                 seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    # The benchmark generators' 0-10 weights, approval polls approve the upper half
+    weights, rated = generate_weights(distribution, voters, options, seed)
+    if _is_approval(poll_model):
+        weights = weights * 2 >= MAX_WEIGHT
+    return weights, rated
+
+
+def partial_ballots(voters: int, options: int, fraction: float, per_voter: int,
+                    seed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Returns (voter, option, 0-10 weight) columns, per_voter distinct options for a random
+    # fraction of the voters
+    rng = np.random.default_rng(random.Random(f"{seed}-partial").randrange(2 ** 32))
+    chosen = np.flatnonzero(rng.random(voters) < fraction)
+    per_voter = min(per_voter, options)
+    picked = np.argsort(rng.random((len(chosen), options)), axis=1)[:, :per_voter]
+    return (np.repeat(chosen, per_voter), picked.reshape(-1),
+            rng.integers(0, MAX_WEIGHT + 1, size=len(chosen) * per_voter))
+
+
+def user_names(prefix: str, voters: int) -> List[str]:
+    return [f"{prefix}{i}" for i in range(voters)]
+
+
+def create_users(prefix: str, voters: int) -> List[str]:
+    names = user_names(prefix, voters)
+    User.objects.bulk_create([User(name=name) for name in names], batch_size=BULK_BATCH_SIZE,
+                             ignore_conflicts=True)
+    return names
+
+
+def _copy(table: str, columns: Iterable[str], lines: Iterable[str]) -> None:
+    quote = connection.ops.quote_name
+    buffer = io.StringIO()
+    buffer.writelines(lines)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {quote(table)} ({', '.join(quote(c) for c in columns)}) "
+                           f"FROM STDIN", buffer)
+
+
+def _weight_tokens(weights: np.ndarray, rated: np.ndarray) -> np.ndarray:
+    if weights.dtype == bool:
+        values = np.where(weights, "t", "f")
+    else:
+        values = weights.astype(str)
+    return np.where(rated, values, "NULL")
+
+
+def copy_votes(poll: PollBase, users: List[str], weights: np.ndarray, rated: np.ndarray,
+               partial: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+    # COPY text format, \N is NULL and arrays are written as {1,NULL,...} literals
+    FullVoteType = getattr(poll, "FullVoteType")  # noqa: N806
+    PartialVoteType = getattr(poll, "PartialVoteType")  # noqa: N806
+    poll_id = PollBase._meta.get_field('timestamp').get_prep_value(poll.timestamp)
+    padding = ",NULL" * (PollBase.MAX_OPTIONS - weights.shape[1])
+    rows = _weight_tokens(weights, rated).tolist()
+    _copy(FullVoteType._meta.db_table, ("poll_id", "user_id", "user_secret", "weights"),
+          (f"{poll_id}\t{user}\t\\N\t{{{','.join(row)}{padding}}}\n"
+           for user, row in zip(users, rows)))
+    voters, options, partial_weights = partial
+    if _is_approval(type(poll)):
+        partial_weights = partial_weights * 2 >= MAX_WEIGHT
+    tokens = _weight_tokens(partial_weights, np.ones(len(partial_weights), dtype=bool)).tolist()
+    _copy(PartialVoteType._meta.db_table, ("poll_id", "user_id", "option", "weight"),
+          (f"{poll_id}\t{users[voter]}\t{option}\t{token}\n"
+           for voter, option, token in zip(voters.tolist(), options.tolist(), tokens)))
+
+
+def bulk_create_votes(poll: PollBase, users: List[str], weights: np.ndarray, rated: np.ndarray,
+                      partial: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+    FullVoteType = getattr(poll, "FullVoteType")  # noqa: N806
+    PartialVoteType = getattr(poll, "PartialVoteType")  # noqa: N806
+    ballots = weights.astype(object)
+    ballots[~rated] = None
+    padding: List[Optional[Any]] = [None] * (PollBase.MAX_OPTIONS - weights.shape[1])
+    FullVoteType.objects.bulk_create(
+        [FullVoteType(poll=poll, user_id=user, weights=row + padding)
+         for user, row in zip(users, ballots.tolist())], batch_size=BULK_BATCH_SIZE)
+    voters, options, partial_weights = partial
+    if _is_approval(type(poll)):
+        partial_weights = partial_weights * 2 >= MAX_WEIGHT
+    PartialVoteType.objects.bulk_create(
+        [PartialVoteType(poll=poll, user_id=users[voter], option=option, weight=weight)
+         for voter, option, weight in zip(voters.tolist(), options.tolist(),
+                                          partial_weights.tolist())],
+        batch_size=BULK_BATCH_SIZE)
+
+
+def create_dataset(poll_model: Type[PollBase], polls: int, voters: int, options: int,
+                   distribution: str = "uniform", partial_fraction: float = 0.3,
+                   partial_options: int = 1, seed: int = 0, channel: str = CHANNEL,
+                   user_prefix: str = USER_PREFIX, method: str = "copy") -> List[PollBase]:
+    # Every poll is voted on by the same voters, poll i's ballots are seeded from (seed, i)
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method}, expected one of {METHODS}")
+    if not 1 <= options <= PollBase.MAX_OPTIONS:
+        raise ValueError(f"Polls have between 1 and {PollBase.MAX_OPTIONS} options")
+    users = create_users(user_prefix, voters)
+    started = time.time()
+    created = [poll_model(timestamp=f"{started + i / 1000:.6f}", channel=channel,
+                          question=f"Synthetic {distribution} poll {i}",
+                          options=[f"Option {o}" for o in range(options)])
+               for i in range(polls)]
+    poll_model.objects.bulk_create(created)
+    write_votes = bulk_create_votes
+    if method == "copy":
+        write_votes = copy_votes
+    for index, poll in enumerate(created):
+        poll_seed = _poll_seed(seed, index)
+        weights, rated = poll_ballots(poll_model, distribution, voters, options, poll_seed)
+        partial = partial_ballots(voters, options, partial_fraction, partial_options,
+                                  poll_seed)
+        with transaction.atomic():
+            write_votes(poll, users, weights, rated, partial)
+    return created
+
+
+def analyze(poll_model: Type[PollBase]) -> None:
+    # Fresh planner statistics, so queries are planned as they would be on a grown table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in (PollBase, User, getattr(poll_model, "FullVoteType"),
+                      getattr(poll_model, "PartialVoteType")):
+            cursor.execute(f"ANALYZE {quote(model._meta.db_table)}")
+
+
+def delete_dataset(channel: str = CHANNEL, user_prefix: str = USER_PREFIX) -> int:
+    # The votes go with their polls and their users
+    deleted = PollBase.objects.filter(channel=channel).delete()[0]
+    return deleted + User.objects.filter(name__startswith=user_prefix).delete()[0]
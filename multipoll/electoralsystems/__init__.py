@@ -1,10 +1,15 @@
-from multipoll.electoralsystems.approval import approval
-from multipoll.electoralsystems.borda import borda
-from multipoll.electoralsystems.rankedpairs import ranked_pairs
-from multipoll.electoralsystems.score import mean_score, mean_score_infinity, median_score,\
-    median_score_infinity, sum_score, sum_score_infinity
-from multipoll.electoralsystems.utils import get_electoral_system
-
-__all__ = ["get_electoral_system",
+from typing import Any
+
+from multipoll.electoralsystems.utils import evaluate_electoral_systems, get_electoral_system
+from multipoll.electoralsystems.utils.registry import SYSTEM_MODULES
+
+__all__ = ["evaluate_electoral_systems", "get_electoral_system",
            "approval", "borda", "ranked_pairs", "mean_score", "median_score", "sum_score",
-           "mean_score_infinity", "median_score_infinity", "sum_score_infinity"]
\ No newline at end of file
+           "mean_score_infinity", "median_score_infinity", "sum_score_infinity"]
+
+
+def __getattr__(name: str) -> Any:
+    # The systems are imported on first use, see SYSTEM_MODULES
+    if name in SYSTEM_MODULES:
+        return get_electoral_system(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
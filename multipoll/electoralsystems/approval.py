@@ -1,18 +1,37 @@
 from __future__ import annotations  # noqa: T484
 
-from typing import List
+from typing import Any, List, Optional, Type
 from typing import TYPE_CHECKING
 
-from multipoll.electoralsystems.utils import ElectoralSystem
+import numpy as np
+
+from multipoll.electoralsystems.utils import Accumulator, BallotMatrix, ElectoralSystem
 from multipoll.utils import FALSEY_VALUES
 
 if TYPE_CHECKING:
     import multipoll.models
 
 
+class ApprovalAccumulator(Accumulator):
+    approvals: List[int]
+
+    def __init__(self, system: Type[ElectoralSystem], options_count: int):
+        super(ApprovalAccumulator, self).__init__(system, options_count)
+        self.approvals = [0 for _ in range(options_count)]
+
+    def update(self, ballot: List[Optional[Any]], sign: int) -> None:
+        for i, w in enumerate(ballot):
+            if w and w not in FALSEY_VALUES:
+                self.approvals[i] += sign
+
+    def generate_scores(self) -> List[float]:
+        return [float(a) for a in self.approvals]
+
+
 class approval(ElectoralSystem):  # noqa: N801
     key = "approval"
     label = "Approval"
+    accumulator_class = ApprovalAccumulator
 
     @classmethod
     def generate_scores(cls, votes: List[multipoll.models.FullVoteBase]) -> List[float]:
@@ -24,3 +43,10 @@ class approval(ElectoralSystem):  # noqa: N801
                 if w and w not in FALSEY_VALUES:
                     scores[i] += 1
         return scores
+
+    @classmethod
+    def generate_batch_scores(cls, ballots: BallotMatrix) -> List[float]:
+        if len(ballots) == 0:
+            return []
+        approvals = np.count_nonzero(ballots.mask & (ballots.weights != 0), axis=0)
+        return [float(a) for a in approvals]
@@ -0,0 +1,201 @@
+from __future__ import annotations  # noqa: T484
+
+import random
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Type
+
+import numpy as np
+
+from multipoll.electoralsystems.utils.registry import ElectoralSystem
+
+# Seeded synthetic ballots for timing the electoral systems without a database. Weights are
+# multi poll style 0-10 ints with None for unrated options, padded to the poll's maximum like
+# stored ballots, which every system also accepts.
+
+DISTRIBUTIONS = ("uniform", "polarized", "sparse", "ties")
+FUNCTIONS = ("generate_scores", "order_options", "visualize_results")
+VOTER_COUNTS = (10, 100, 1000, 10000, 100000)
+OPTION_COUNTS = (2, 5, 20, 99)
+MAX_WEIGHT = 10
+SPARSE_RATED = 3
+
+
+class SyntheticPoll:
+    def __init__(self, question: str, options: List[str]):
+        self.question = question
+        self.options = options
+
+
+class SyntheticVote:
+    # The parts of FullVoteBase the electoral systems read
+    def __init__(self, poll: SyntheticPoll, user: str, weights: List[Optional[int]]):
+        self.poll = poll
+        self.user = user
+        self.weights = weights
+
+    @property
+    def options(self) -> List[Tuple[str, Optional[int]]]:
+        return list(zip(self.poll.options, self.weights))
+
+
+def _case_rng(seed: int, distribution: str, voters: int, options: int) -> np.random.Generator:
+    # Each case is seeded on its own, so a case's ballots don't depend on which others ran
+    case_seed = random.Random(f"{seed}-{distribution}-{voters}-{options}").randrange(2 ** 32)
+    return np.random.default_rng(case_seed)
+
+
+def generate_weights(distribution: str, voters: int, options: int,
+                     seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    # Returns voters x options weights and the mask of which of them were rated
+    rng = _case_rng(seed, distribution, voters, options)
+    if distribution == "uniform":
+        weights = rng.integers(0, MAX_WEIGHT + 1, size=(voters, options))
+        rated = np.ones((voters, options), dtype=bool)
+    elif distribution == "polarized":
+        # Two camps loving opposite halves of the options, with a little noise
+        camp = rng.random(voters) < 0.5
+        favoured = np.arange(options) < (options + 1) // 2
+        loves = camp[:, None] == favoured[None, :]
+        weights = np.where(loves, rng.integers(8, MAX_WEIGHT + 1, size=(voters, options)),
+                           rng.integers(0, 3, size=(voters, options)))
+        rated = rng.random((voters, options)) < 0.95
+    elif distribution == "sparse":
+        # Most voters only rate a few random options, the rest rate everything
+        weights = rng.integers(0, MAX_WEIGHT + 1, size=(voters, options))
+        picked = np.argsort(rng.random((voters, options)), axis=1)[:, :SPARSE_RATED]
+        rated = np.zeros((voters, options), dtype=bool)
+        np.put_along_axis(rated, picked, True, axis=1)
+        rated[rng.random(voters) < 0.1] = True
+    elif distribution == "ties":
+        # Three levels only, so rankings and pairwise majorities are full of ties
+        weights = rng.choice(np.array([0, MAX_WEIGHT // 2, MAX_WEIGHT]), size=(voters, options))
+        rated = rng.random((voters, options)) < 0.8
+    else:
+        raise ValueError(f"Unknown distribution {distribution}, expected one of "
+                         f"{DISTRIBUTIONS}")
+    return weights, rated
+
+
+def generate_votes(distribution: str, voters: int, options: int, seed: int = 0,
+                   max_options: Optional[int] = None) -> List[SyntheticVote]:
+    weights, rated = generate_weights(distribution, voters, options, seed)
+    ballots = weights.astype(object)
+    ballots[~rated] = None
+    padding = [None] * max(0, (max_options or options) - options)
+    poll = SyntheticPoll(f"{distribution} {voters}x{options}",
+                         [f"Option {i}" for i in range(options)])
+    return [SyntheticVote(poll, f"voter{i}", row + padding)
+            for i, row in enumerate(ballots.tolist())]
+
+
+def _call(system: Type[ElectoralSystem], function: str,
+          votes: List[SyntheticVote]) -> Callable[[], Any]:
+    options = votes[0].poll.options
+    if function == "generate_scores":
+        return lambda: system.generate_scores(votes)  # noqa: T484
+    elif function == "order_options":
+        return lambda: system.order_options(options, votes)  # noqa: T484
+    elif function == "visualize_results":
+        return lambda: system.visualize_results(votes[0].poll.question, options,
+                                                votes)  # noqa: T484
+    raise ValueError(f"Unknown function {function}, expected one of {FUNCTIONS}")
+
+
+@dataclass
+class BenchmarkResult:
+    system: str
+    function: str
+    distribution: str
+    voters: int
+    options: int
+    runs: int
+    min_ms: float
+    median_ms: float
+
+    @property
+    def key(self) -> Tuple[str, str, str, int, int]:
+        return self.system, self.function, self.distribution, self.voters, self.options
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def time_call(call: Callable[[], Any], repeat: int, max_seconds: float) -> List[float]:
+    # At least one run, then more until repeat runs or max_seconds have been spent
+    timings: List[float] = []
+    spent = 0.0
+    while len(timings) < max(1, repeat) and (not timings or spent < max_seconds):
+        started = time.perf_counter()
+        call()
+        elapsed = time.perf_counter() - started
+        timings.append(elapsed)
+        spent += elapsed
+    return timings
+
+
+def run_benchmarks(systems: Sequence[Type[ElectoralSystem]], functions: Sequence[str] = FUNCTIONS,
+                   distributions: Sequence[str] = DISTRIBUTIONS,
+                   voter_counts: Sequence[int] = VOTER_COUNTS,
+                   option_counts: Sequence[int] = OPTION_COUNTS, seed: int = 0,
+                   repeat: int = 5, max_seconds: float = 5.0, max_options: Optional[int] = None,
+                   progress: Optional[Callable[[BenchmarkResult], None]] = None) \
+        -> Iterable[BenchmarkResult]:
+    # Once a case takes longer than max_seconds the larger voter counts of the same system,
+    # function and options are skipped, they would only take longer
+    too_slow: Set[Tuple[str, str, str, int]] = set()
+    for distribution in distributions:
+        for options in option_counts:
+            for voters in sorted(voter_counts):
+                votes = generate_votes(distribution, voters, options, seed, max_options)
+                for system in systems:
+                    for function in functions:
+                        slow_key = (system.key, function, distribution, options)
+                        if slow_key in too_slow:
+                            continue
+                        timings = time_call(_call(system, function, votes), repeat,
+                                            max_seconds)
+                        if timings[0] > max_seconds:
+                            too_slow.add(slow_key)
+                        result = BenchmarkResult(system.key, function, distribution, voters,
+                                                 options, len(timings), min(timings) * 1000,
+                                                 statistics.median(timings) * 1000)
+                        if progress is not None:
+                            progress(result)
+                        yield result
+
+
+@dataclass
+class Comparison:
+    key: Tuple[str, str, str, int, int]
+    before_ms: float
+    after_ms: float
+
+    @property
+    def ratio(self) -> float:
+        if not self.before_ms:
+            return float("inf")
+        return self.after_ms / self.before_ms
+
+
+def compare_results(before: Iterable[BenchmarkResult], after: Iterable[BenchmarkResult],
+                    threshold: float = 0.1, min_ms: float = 0.05) \
+        -> Tuple[List[Comparison], List[Comparison]]:
+    # Regressions and improvements by more than threshold, on the fastest run of each case.
+    # Cases where both runs are under min_ms are timer noise and ignored.
+    previous = {result.key: result for result in before}
+    regressions: List[Comparison] = []
+    improvements: List[Comparison] = []
+    for result in after:
+        old = previous.get(result.key, None)
+        if old is None or max(old.min_ms, result.min_ms) < min_ms:
+            continue
+        comparison = Comparison(result.key, old.min_ms, result.min_ms)
+        if comparison.ratio > 1 + threshold:
+            regressions.append(comparison)
+        elif comparison.ratio < 1 / (1 + threshold):
+            improvements.append(comparison)
+    regressions.sort(key=lambda c: c.ratio, reverse=True)
+    improvements.sort(key=lambda c: c.ratio)
+    return regressions, improvements
@@ -1,18 +1,39 @@
 from __future__ import annotations  # noqa
 
-from typing import List
+import math
+from typing import Any, List, Optional, Type
 from typing import TYPE_CHECKING
 
-from multipoll.electoralsystems.utils import ElectoralSystem
+import numpy as np
+
+from multipoll.electoralsystems.utils import Accumulator, BallotMatrix, ElectoralSystem
 from multipoll.electoralsystems.utils.ranking import Ranking
 
 if TYPE_CHECKING:
     import multipoll.models  # noqa: E402
 
 
+class BordaAccumulator(Accumulator):
+    sums: List[float]
+
+    def __init__(self, system: Type[ElectoralSystem], options_count: int):
+        super(BordaAccumulator, self).__init__(system, options_count)
+        self.sums = [0.0 for _ in range(options_count)]
+
+    def update(self, ballot: List[Optional[Any]], sign: int) -> None:
+        ranks = BallotMatrix.from_ballots([ballot], self.options_count).dense_ranks()[0]
+        for i, w in enumerate(ranks.tolist()):
+            if not math.isnan(w):
+                self.sums[i] += sign * w
+
+    def generate_scores(self) -> List[float]:
+        return list(self.sums)
+
+
 class borda(ElectoralSystem):  # noqa: N801
     key = "borda"
     label = "Borda Count"
+    accumulator_class = BordaAccumulator
 
     @classmethod
     def generate_scores(cls, votes: List[multipoll.models.FullVoteBase]) -> List[float]:
@@ -26,3 +47,10 @@ class borda(ElectoralSystem):  # noqa: N801
                 if w is not None:
                     scores[i] += w
         return scores
+
+    @classmethod
+    def generate_batch_scores(cls, ballots: BallotMatrix) -> List[float]:
+        if len(ballots) == 0:
+            return []
+        ranks = ballots.dense_ranks()
+        return [float(s) for s in np.where(ballots.mask, ranks, 0.0).sum(axis=0)]
@@ -1,13 +1,13 @@
 from __future__ import annotations  # noqa
 
 import logging
-from dataclasses import dataclass, field
-from typing import Generic, Iterator, List, Optional, Tuple, TypeVar, Union
+from operator import attrgetter
+from typing import Any, Iterator, List, Optional, Tuple, Type, Union
 from typing import TYPE_CHECKING
 
-from django.template.loader import render_to_string
+import numpy as np
 
-from multipoll.electoralsystems.utils import ElectoralSystem
+from multipoll.electoralsystems.utils import Accumulator, BallotMatrix, ElectoralSystem
 from multipoll.electoralsystems.utils.ranking import Majority, Ranking
 
 if TYPE_CHECKING:
@@ -15,72 +15,87 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
-_TCov = TypeVar("_TCov", covariant=True)
 
+class Reachability:
+    # Each row is a bitset of the options reachable from that option, and each column the
+    # options that can reach it, so closing over a new edge is a handful of integer ors.
+    rows: List[int]
+    columns: List[int]
 
-@dataclass
-class Tree(Generic[_TCov]):
-    value: _TCov
-    children: List[Tree[_TCov]] = field(default_factory=list, init=False)
+    def __init__(self, options_count: int):
+        self.rows = [1 << i for i in range(options_count)]
+        self.columns = list(self.rows)
 
-    def __iter__(self) -> Iterator[_TCov]:
-        yield self.value
-        for child in self.children:
-            yield from iter(child)
+    def __len__(self) -> int:
+        return len(self.rows)
 
-    @staticmethod
-    def meld(reachability: List[List[Optional[Tree[int]]]], x: int, j: int, u: int, v: int) \
-            -> None:
-        # x is origin
-        # u is intermediate node
-        # v is destination
-        tree_xu = reachability[x][u]
-        tree_jv = reachability[j][v]
-        if tree_xu is not None and tree_jv is not None:
-            new_tree = Tree[int](v)
-            reachability[x][v] = new_tree
-            tree_xu.children.append(new_tree)
-            for w in tree_jv:
-                if reachability[x][w] is None:
-                    Tree.meld(reachability, x, j, v, w)
-        else:
-            logger.warn(f"{x} -> {u} [{tree_xu}] or {j} -> {v} [{tree_jv}] was None")
+    def reaches(self, source: int, destination: int) -> bool:
+        return bool((self.rows[source] >> destination) & 1)
+
+    def add_edge(self, source: int, destination: int) -> bool:
+        if self.reaches(destination, source):
+            return False
+        # Anything already reaching destination reaches everything after it as well
+        sources = self.columns[source] & ~self.columns[destination]
+        if not sources:
+            return True
+        destinations = self.rows[destination]
+        for x in _iter_bits(sources):
+            self.rows[x] |= destinations
+        for y in _iter_bits(destinations):
+            self.columns[y] |= sources
+        return True
+
+    def counts(self) -> List[int]:
+        return [bin(row).count("1") for row in self.rows]
 
     @staticmethod
     def calculate_reachability(options_count: int, majorities: List[Majority]) \
-            -> Tuple[List[List[Optional[Tree[int]]]],
-                     List[Tuple[int, Majority]],
-                     List[Tuple[int, Majority]]]:
-        reachability: List[List[Optional[Tree[int]]]] = [[None for _2 in range(options_count)]
-                                                         for _ in range(options_count)]
+            -> Tuple[Reachability, List[Tuple[int, Majority]], List[Tuple[int, Majority]]]:
+        reachability = Reachability(options_count)
         added_edges: List[Tuple[int, Majority]] = []
         skipped_edges: List[Tuple[int, Majority]] = []
-        for i in range(options_count):
-            reachability[i][i] = Tree[int](i)
         for i, majority in enumerate(majorities):
-            if reachability[majority.opposing_option][majority.option] is None:
+            if reachability.add_edge(majority.option, majority.opposing_option):
                 added_edges.append((i + 1, majority))
-                for x in range(options_count):
-                    if reachability[x][majority.option] is not None \
-                            and reachability[x][majority.opposing_option] is None:
-                        Tree.meld(reachability, x, majority.opposing_option,
-                                  majority.option, majority.opposing_option)
             else:
                 skipped_edges.append((i + 1, majority))
         return reachability, added_edges, skipped_edges
 
 
+def _iter_bits(bits: int) -> Iterator[int]:
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class PairwiseAccumulator(Accumulator):
+    comparisons: np.ndarray
+
+    def __init__(self, system: Type[ElectoralSystem], options_count: int):
+        super(PairwiseAccumulator, self).__init__(system, options_count)
+        self.comparisons = np.zeros((options_count, options_count), dtype=np.int64)
+
+    def update(self, ballot: List[Optional[Any]], sign: int) -> None:
+        weights = BallotMatrix.from_ballots([ballot], self.options_count).weights[0]
+        beats = weights[:, np.newaxis] > weights[np.newaxis, :]
+        self.comparisons += sign * beats
+
+    def generate_scores(self) -> List[float]:
+        reachability, _, _ = \
+            ranked_pairs.reachability_from_comparisons(self.comparisons.tolist())
+        return reachability.counts()
+
+
 class ranked_pairs(ElectoralSystem):  # noqa: N801
     key = "ranked_pairs"
     label = "Ranked Pairs"
+    accumulator_class = PairwiseAccumulator
 
     @classmethod
-    def calculate_reachability_and_edges(cls, votes: List[multipoll.models.FullVoteBase]) \
-            -> Tuple[List[List[Optional[Tree]]],
-                     List[Tuple[int, Majority]],
-                     List[Tuple[int, Majority]]]:
-        if len(votes) == 0:
-            return ([], [], [])
+    def calculate_comparisons(cls, votes: List[multipoll.models.FullVoteBase]) \
+            -> List[List[int]]:
         rankings = [Ranking(vote) for vote in votes]
         options_count = len(rankings[0].indexes)
         comparisons: List[List[int]] = [[0 for _2 in range(options_count)]
@@ -95,15 +110,35 @@ class ranked_pairs(ElectoralSystem):  # noqa: N801
                             comparisons[i][j0 + i + 1] += 1
                         elif w2 > w:
                             comparisons[j0 + i + 1][i] += 1
-        majorities = sorted(Majority.populate_majorities(comparisons), reverse=True)
-        return Tree[int].calculate_reachability(options_count, majorities)
+        return comparisons
+
+    @classmethod
+    def reachability_from_comparisons(cls, comparisons: List[List[int]]) \
+            -> Tuple[Reachability, List[Tuple[int, Majority]], List[Tuple[int, Majority]]]:
+        majorities = sorted(Majority.populate_majorities(comparisons),
+                            key=attrgetter("sort_key"), reverse=True)
+        return Reachability.calculate_reachability(len(comparisons), majorities)
+
+    @classmethod
+    def calculate_reachability_and_edges(cls, votes: List[multipoll.models.FullVoteBase]) \
+            -> Tuple[Reachability, List[Tuple[int, Majority]], List[Tuple[int, Majority]]]:
+        if len(votes) == 0:
+            return (Reachability(0), [], [])
+        return cls.reachability_from_comparisons(cls.calculate_comparisons(votes))
 
     @classmethod
     def generate_scores(cls, votes: List[multipoll.models.FullVoteBase]) -> List[float]:
         if len(votes) == 0:
             return []
         reachability, _, _ = cls.calculate_reachability_and_edges(votes)
-        return [sum(1 for t in reachable if t is not None) for reachable in reachability]
+        return reachability.counts()
+
+    @classmethod
+    def generate_batch_scores(cls, ballots: BallotMatrix) -> List[float]:
+        if len(ballots) == 0:
+            return []
+        reachability, _, _ = cls.reachability_from_comparisons(ballots.pairwise_comparisons())
+        return reachability.counts()
 
     @classmethod
     def visualize_results(cls, question: str, options: List[str],
@@ -111,10 +146,11 @@ class ranked_pairs(ElectoralSystem):  # noqa: N801
             -> Optional[Union[bytes, str]]:
         if len(votes) == 0:
             return None
-        reachability, edges, skipped = cls.calculate_reachability_and_edges(votes)
+        comparisons = BallotMatrix.from_votes(votes).pairwise_comparisons()
+        reachability, edges, skipped = cls.reachability_from_comparisons(comparisons)
         all_edges = sorted([(i, True, majority) for i, majority in edges]
                            + [(i, False, majority) for i, majority in skipped])
-        scores = [sum(1 for t in reachable if t is not None) for reachable in reachability]
+        scores = reachability.counts()
         result: List[str] = ['digraph {', f'    label="{question}"', '    pack=false',
                              '    overlap=false', '    splines=polyline', '    newrank=true',
                              '    rankdir="TB"', "    truecolor=true", '    ranksep="1 equally"',
@@ -134,4 +170,6 @@ class ranked_pairs(ElectoralSystem):  # noqa: N801
                 result.append(f'    n{source} -> n{dest} [label="({i}) {margin_str}", '
                               + f'constraint=false, style=dashed, color="#ffaaaa"]')
             graphs.append('\n'.join(result + ['}']))
+        # Only the visualization needs the template machinery
+        from django.template.loader import render_to_string
         return render_to_string('visualize_rankedpairs.html', {'graphs': graphs})
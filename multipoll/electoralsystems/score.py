@@ -1,13 +1,17 @@
 from __future__ import annotations  # noqa
 
 import abc
+import bisect
 import statistics
-from typing import List, Union
+from fractions import Fraction
+from typing import Any, Iterable, List, Optional, Tuple, Type, Union
 from typing import TYPE_CHECKING
 
 from django.utils.decorators import classproperty
 
-from multipoll.electoralsystems.utils import ElectoralSystem
+import numpy as np
+
+from multipoll.electoralsystems.utils import Accumulator, Ballot, BallotMatrix, ElectoralSystem
 from multipoll.electoralsystems.utils.cardinalscores import INFINITY
 from multipoll.electoralsystems.utils.cardinalscores import InfinityType
 from multipoll.electoralsystems.utils.cardinalscores import normalize_scores
@@ -16,12 +20,46 @@ if TYPE_CHECKING:
     import multipoll.models  # noqa: E402
 
 
+class ScoreAccumulator(Accumulator):
+    # Totals are exact so retracting a ballot never drifts, and converting them back to floats
+    # gives the same correctly rounded results as statistics.mean.
+    system: Type[AbstractScore]
+    totals: List[Fraction]
+    values: List[List[float]]
+
+    def __init__(self, system: Type[ElectoralSystem], options_count: int):
+        super(ScoreAccumulator, self).__init__(system, options_count)
+        self.totals = [Fraction(0) for _ in range(options_count)]
+        self.values = [[] for _ in range(options_count)]
+
+    def update(self, ballot: List[Optional[Any]], sign: int) -> None:
+        for i, score in enumerate(normalize_scores(ballot, self.system.dim)):
+            if score is None:
+                continue
+            self.totals[i] += sign * Fraction(score)
+            if sign > 0:
+                bisect.insort(self.values[i], score)
+            else:
+                del self.values[i][bisect.bisect_left(self.values[i], score)]
+
+    def generate_scores(self) -> List[float]:
+        return [int(100 * self.system.combine_accumulated(self, i))
+                for i in range(self.options_count)]
+
+
 class AbstractScore(ElectoralSystem, metaclass=abc.ABCMeta):
+    accumulator_class = ScoreAccumulator
+
     @classmethod
     @abc.abstractmethod
     def combine_scores(cls, scores: List[float]) -> float:
         ...
 
+    @classmethod
+    @abc.abstractmethod
+    def combine_accumulated(cls, accumulator: ScoreAccumulator, option: int) -> float:
+        ...
+
     @classproperty
     def dim(cls) -> Union[int, InfinityType]:  # noqa: N805
         return 2
@@ -35,6 +73,20 @@ class AbstractScore(ElectoralSystem, metaclass=abc.ABCMeta):
                   for i in range(len(votes[0].options))]
         return [None if s is None else int(100 * s) for s in scores]  # noqa: IF100
 
+    @classmethod
+    def combine_score_columns(cls, normalized: np.ndarray) -> List[float]:
+        mask = ~np.isnan(normalized)
+        return [cls.combine_scores(normalized[:, i][mask[:, i]].tolist())
+                for i in range(normalized.shape[1])]
+
+    @classmethod
+    def generate_batch_scores(cls, ballots: BallotMatrix) -> List[float]:
+        if len(ballots) == 0:
+            return []
+        normalized = ballots.normalized(cls.dim)
+        scores = cls.combine_score_columns(normalized)
+        return [None if s is None else int(100 * s) for s in scores]  # noqa: IF100
+
 
 class sum_score(AbstractScore):  # noqa: N801
     key = "sum_score"
@@ -46,6 +98,25 @@ class sum_score(AbstractScore):  # noqa: N801
             return 0
         return sum(scores)
 
+    @classmethod
+    def combine_accumulated(cls, accumulator: ScoreAccumulator, option: int) -> float:
+        # The correctly rounded total, which can differ from sum() in the last bit
+        if len(accumulator.values[option]) == 0:
+            return 0
+        return float(accumulator.totals[option])
+
+    @classmethod
+    def order_accumulated(cls, options: List[str],
+                          ballots: Iterable[Tuple[multipoll.models.User, Ballot]],
+                          accumulator: Accumulator) \
+            -> List[Tuple[str, List[Tuple[multipoll.models.User, Optional[Any]]], float]]:
+        # A float sum depends on the order it is added up in, and int(100 * s) can turn the
+        # last bit into a whole point, so poll results add the ballots up in order like
+        # generate_scores does rather than using the running totals
+        ballots = list(ballots)
+        matrix = BallotMatrix.from_ballots([ballot for _, ballot in ballots], len(options))
+        return cls.order_scored_ballots(options, ballots, cls.generate_batch_scores(matrix))
+
 
 class median_score(AbstractScore):  # noqa: N801
     key = "median_score"
@@ -57,6 +128,17 @@ class median_score(AbstractScore):  # noqa: N801
             return 0
         return statistics.median(scores)
 
+    @classmethod
+    def combine_accumulated(cls, accumulator: ScoreAccumulator, option: int) -> float:
+        values = accumulator.values[option]
+        count = len(values)
+        if count == 0:
+            return 0
+        elif count % 2 == 1:
+            return values[count // 2]
+        else:
+            return (values[count // 2 - 1] + values[count // 2]) / 2
+
 
 class mean_score(AbstractScore):  # noqa: N801
     key = "mean_score"
@@ -68,6 +150,13 @@ class mean_score(AbstractScore):  # noqa: N801
             return 0
         return statistics.mean(scores)
 
+    @classmethod
+    def combine_accumulated(cls, accumulator: ScoreAccumulator, option: int) -> float:
+        count = len(accumulator.values[option])
+        if count == 0:
+            return 0
+        return float(accumulator.totals[option] / count)
+
 
 class sum_score_infinity(sum_score):  # noqa: N801
     key = "sum_score_infinity"
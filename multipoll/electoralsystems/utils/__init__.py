@@ -1,4 +1,10 @@
+from multipoll.electoralsystems.utils.accumulator import Accumulator, Ballot
+from multipoll.electoralsystems.utils.ballotmatrix import BallotMatrix
 from multipoll.electoralsystems.utils.registry import ElectoralSystem
+from multipoll.electoralsystems.utils.registry import evaluate_electoral_systems
+from multipoll.electoralsystems.utils.registry import evaluate_electoral_systems_on_ballots
 from multipoll.electoralsystems.utils.registry import get_electoral_system
 
-__all__ = ["cardinalscores", "ranking", "registry", "ElectoralSystem", "get_electoral_system"]
\ No newline at end of file
+__all__ = ["accumulator", "ballotmatrix", "cardinalscores", "ranking", "registry", "Accumulator",
+           "Ballot", "BallotMatrix", "ElectoralSystem", "evaluate_electoral_systems",
+           "evaluate_electoral_systems_on_ballots", "get_electoral_system"]
\ No newline at end of file
@@ -0,0 +1,48 @@
+from __future__ import annotations  # noqa: T484
+
+import abc
+from typing import Any, List, Optional, Sequence, Type
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from multipoll.electoralsystems.utils.registry import ElectoralSystem
+
+Ballot = Sequence[Optional[Any]]
+
+
+class Accumulator(abc.ABC):
+    # Running tally for one electoral system. A voter changing their ballot is applied as
+    # apply(old_ballot, new_ballot), with None standing in for "had/has no ballot".
+    system: Type[ElectoralSystem]
+    options_count: int
+    voters: int
+
+    def __init__(self, system: Type[ElectoralSystem], options_count: int):
+        self.system = system
+        self.options_count = options_count
+        self.voters = 0
+
+    def apply(self, old_ballot: Optional[Ballot], new_ballot: Optional[Ballot]) -> None:
+        if old_ballot is not None:
+            self.voters -= 1
+            self.update(self.fit_ballot(old_ballot), -1)
+        if new_ballot is not None:
+            self.voters += 1
+            self.update(self.fit_ballot(new_ballot), 1)
+
+    def fit_ballot(self, ballot: Ballot) -> List[Optional[Any]]:
+        fitted = list(ballot[:self.options_count])
+        return fitted + [None for _ in range(self.options_count - len(fitted))]
+
+    def scores(self) -> List[float]:
+        if self.voters == 0:
+            return []
+        return self.generate_scores()
+
+    @abc.abstractmethod
+    def update(self, ballot: List[Optional[Any]], sign: int) -> None:
+        ...
+
+    @abc.abstractmethod
+    def generate_scores(self) -> List[float]:
+        ...
@@ -0,0 +1,129 @@
+from __future__ import annotations  # noqa: T484
+
+from typing import Any, Dict, List, Optional, Sequence, Union
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from multipoll.electoralsystems.utils.cardinalscores import InfinityType
+from multipoll.electoralsystems.utils.cardinalscores import normalize_score_matrix
+from multipoll.utils import FALSEY_VALUES
+
+if TYPE_CHECKING:
+    import multipoll.models
+
+
+def _weight_to_float(weight: Any) -> float:
+    if weight is None:
+        return np.nan
+    elif isinstance(weight, str):
+        if not weight or weight in FALSEY_VALUES:
+            return 0.0
+        try:
+            return float(weight)
+        except ValueError:
+            return 1.0
+    else:
+        return float(weight)
+
+
+class BallotMatrix:
+    # Derived matrices are memoized so evaluating several systems over the same ballots only
+    # ranks, normalizes and compares them once. Callers must treat the results as read-only.
+    weights: np.ndarray
+    users: List[multipoll.models.User]
+    _dense_ranks: Optional[np.ndarray]
+    _comparisons: Optional[List[List[int]]]
+    _normalized: Dict[Union[int, InfinityType], np.ndarray]
+
+    def __init__(self, weights: np.ndarray,
+                 users: Optional[List[multipoll.models.User]] = None):
+        self.weights = weights
+        if users is None:
+            users = []
+        self.users = users
+        self._dense_ranks = None
+        self._comparisons = None
+        self._normalized = {}
+
+    @classmethod
+    def from_votes(cls, votes: Sequence[multipoll.models.FullVoteBase],
+                   options_count: Optional[int] = None) -> BallotMatrix:
+        if options_count is None:
+            options_count = 0
+            if votes:
+                options_count = len(votes[0].poll.options)
+        return cls.from_ballots([vote.weights for vote in votes], options_count,
+                                [vote.user for vote in votes])
+
+    @classmethod
+    def from_ballots(cls, ballots: Sequence[Sequence[Any]], options_count: int,
+                     users: Optional[List[multipoll.models.User]] = None) -> BallotMatrix:
+        weights = np.full((len(ballots), options_count), np.nan, dtype=np.float64)
+        for i, ballot in enumerate(ballots):
+            row = ballot[:options_count]
+            try:
+                weights[i, :len(row)] = np.array(row, dtype=np.float64)
+            except (TypeError, ValueError):
+                weights[i, :len(row)] = [_weight_to_float(w) for w in row]
+        return cls(weights, users)
+
+    @property
+    def voters_count(self) -> int:
+        return int(self.weights.shape[0])
+
+    @property
+    def options_count(self) -> int:
+        return int(self.weights.shape[1])
+
+    @property
+    def mask(self) -> np.ndarray:
+        return ~np.isnan(self.weights)
+
+    def __len__(self) -> int:
+        return self.voters_count
+
+    def dense_ranks(self) -> np.ndarray:
+        if self._dense_ranks is None:
+            self._dense_ranks = self._calculate_dense_ranks()
+        return self._dense_ranks
+
+    def _calculate_dense_ranks(self) -> np.ndarray:
+        # Matches Ranking(vote).weights row by row, leaving NaN where the vote was None
+        weights = self.weights
+        ranks = np.full(weights.shape, np.nan, dtype=np.float64)
+        if weights.size == 0:
+            return ranks
+        mask = self.mask
+        order = np.argsort(weights, axis=1, kind='stable')
+        ordered = np.take_along_axis(weights, order, axis=1)
+        ordered_mask = np.take_along_axis(mask, order, axis=1)
+        steps = np.zeros(weights.shape, dtype=np.float64)
+        steps[:, 0] = 1
+        steps[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+        steps[~ordered_mask] = 0
+        dense = np.cumsum(steps, axis=1)
+        counts = mask.sum(axis=1, keepdims=True)
+        distinct = dense[:, -1:]
+        ordered_ranks = np.where(ordered_mask, dense + counts - distinct, np.nan)
+        np.put_along_axis(ranks, order, ordered_ranks, axis=1)
+        return ranks
+
+    def normalized(self, dim: Union[int, InfinityType] = 2) -> np.ndarray:
+        if dim not in self._normalized:
+            self._normalized[dim] = normalize_score_matrix(self.weights, dim)
+        return self._normalized[dim]
+
+    def pairwise_comparisons(self) -> List[List[int]]:
+        if self._comparisons is None:
+            self._comparisons = self._calculate_pairwise_comparisons()
+        return self._comparisons
+
+    def _calculate_pairwise_comparisons(self) -> List[List[int]]:
+        weights = self.weights
+        options_count = self.options_count
+        comparisons: List[List[int]] = []
+        for i in range(options_count):
+            beats = (weights[:, i:i + 1] > weights).sum(axis=0)
+            comparisons.append([int(c) for c in beats])
+        return comparisons
@@ -2,6 +2,8 @@ from __future__ import annotations  # noqa: T484
 
 from typing import List, Optional, Tuple, Union
 
+import numpy as np
+
 
 class InfinityType:
     pass
@@ -33,6 +35,28 @@ def normalize_scores(scores: List[Optional[Union[float, int]]],
     return scores
 
 
+def normalize_score_matrix(weights: np.ndarray,
+                           dim: Union[int, InfinityType] = 2) -> np.ndarray:
+    # Row-wise normalize_scores over a voters x options matrix with NaN for None. Sums are
+    # accumulated left to right and roots taken with Python floats so the results are
+    # bit-identical to calling normalize_scores on each row.
+    mask = ~np.isnan(weights)
+    magnitudes = np.where(mask, np.abs(weights), 0.0)
+    if isinstance(dim, InfinityType):
+        norms = magnitudes.max(axis=1, initial=0.0)
+    elif dim == 0:
+        norms = np.count_nonzero(mask & (weights != 0), axis=1).astype(np.float64)
+    else:
+        totals = np.zeros(weights.shape[0])
+        if weights.shape[1]:
+            totals = np.cumsum(magnitudes ** dim, axis=1)[:, -1]
+        norms = np.array([t ** (1 / dim) for t in totals.tolist()], dtype=np.float64)
+    norms = np.abs(norms).reshape(-1, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(norms == 0, 0.0, weights / norms)
+    return np.where(mask, scaled, np.nan)
+
+
 def normalize_scores_with_fixed_max_ints(scores: List[Optional[Union[float, int]]],
                                          max_score: Optional[int] = None) -> List[Optional[int]]:
     if max_score is None:
@@ -1,7 +1,6 @@
 from __future__ import annotations  # noqa: T484
 
-from dataclasses import dataclass
-from functools import total_ordering
+from dataclasses import dataclass, field
 from typing import Iterable, List, Optional, Tuple
 from typing import TYPE_CHECKING
 
@@ -45,7 +44,6 @@ class Ranking:
         self.indexes = [i for i, _ in prelims] + none_indexes
 
 
-@total_ordering
 @dataclass(order=False, frozen=False)
 class Majority:
     votes_for: int
@@ -53,19 +51,16 @@ class Majority:
     wins: int
     option: int
     opposing_option: int
+    sort_key: Tuple[int, int, int, int, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Ascending order matches the original comparison chain: fewer votes for, more votes
+        # against, fewer wins, then higher option indexes sort first.
+        self.sort_key = (self.votes_for, -self.votes_against, self.wins, -self.option,
+                         -self.opposing_option)
 
     def __lt__(self, other: object) -> bool:
-        return (isinstance(other, self.__class__)
-                and (self.votes_for < other.votes_for
-                     or (self.votes_for == other.votes_for
-                         and (self.votes_against > other.votes_against
-                              or (self.votes_against == other.votes_against
-                                  and (self.wins < other.wins
-                                       or (self.wins == other.wins
-                                           and (self.option > other.option
-                                                or (self.option == other.option
-                                                    and self.opposing_option
-                                                    > other.opposing_option)))))))))
+        return isinstance(other, self.__class__) and self.sort_key < other.sort_key
 
     @property
     def margin(self) -> int:
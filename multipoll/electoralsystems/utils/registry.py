@@ -1,9 +1,13 @@
 from __future__ import annotations  # noqa: T484
 
 import abc
-from typing import Any, Dict, List, Optional, Tuple, Type, Union
+import importlib
+from typing import Any, ClassVar, Dict, Iterable, List, Optional, Tuple, Type, Union
 from typing import TYPE_CHECKING
 
+from multipoll.electoralsystems.utils.accumulator import Accumulator, Ballot
+from multipoll.electoralsystems.utils.ballotmatrix import BallotMatrix
+
 if TYPE_CHECKING:
     import multipoll.models
 
@@ -29,30 +33,95 @@ class ElectoralSystemMeta(abc.ABCMeta):
 
 
 class ElectoralSystem(abc.ABC, metaclass=ElectoralSystemMeta):  # noqa: N801
+    accumulator_class: ClassVar[Type[Accumulator]]
+
     @classmethod
     def order_options(cls, options: List[str],
                       votes: List[multipoll.models.FullVoteBase]) \
             -> List[Tuple[str, List[Tuple[multipoll.models.User, Optional[Any]]], float]]:
-        scores = cls.generate_scores(votes)
+        scores = cls.generate_batch_scores(BallotMatrix.from_votes(votes))
+        return cls.order_scored_ballots(options, ((vote.user, vote.weights) for vote in votes),
+                                        scores)
+
+    @classmethod
+    def order_accumulated(cls, options: List[str],
+                          ballots: Iterable[Tuple[multipoll.models.User, Ballot]],
+                          accumulator: Accumulator) \
+            -> List[Tuple[str, List[Tuple[multipoll.models.User, Optional[Any]]], float]]:
+        return cls.order_scored_ballots(options, ballots, accumulator.scores())
+
+    @staticmethod
+    def order_scored_ballots(options: List[str],
+                             ballots: Iterable[Tuple[multipoll.models.User, Ballot]],
+                             scores: List[float]) \
+            -> List[Tuple[str, List[Tuple[multipoll.models.User, Optional[Any]]], float]]:
         collected_votes: List[List[Tuple[multipoll.models.User, Optional[Any]]]] = \
             [[] for _ in options]
-        for vote in votes:
-            for i, w in enumerate(vote.weights):
+        for user, weights in ballots:
+            for i, w in enumerate(weights):
                 if w is not None:
-                    collected_votes[i].append((vote.user, w))
+                    collected_votes[i].append((user, w))
         return sorted(zip(options, collected_votes, scores), key=lambda o: o[2], reverse=True)
 
+    @classmethod
+    def create_accumulator(cls, options_count: int) -> Accumulator:
+        return cls.accumulator_class(cls, options_count)
+
+    @classmethod
+    def accumulate(cls, ballots: Iterable[Ballot], options_count: int) -> Accumulator:
+        accumulator = cls.create_accumulator(options_count)
+        for ballot in ballots:
+            accumulator.apply(None, ballot)
+        return accumulator
+
     @classmethod
     @abc.abstractmethod
     def generate_scores(cls, votes: List[multipoll.models.FullVoteBase]) -> List[float]:
+        # Per-vote reference implementation, generate_batch_scores must match it exactly
         ...
 
     @classmethod
-    def visualize_results(cls, options: List[str],
+    @abc.abstractmethod
+    def generate_batch_scores(cls, ballots: BallotMatrix) -> List[float]:
+        ...
+
+    @classmethod
+    def visualize_results(cls, question: str, options: List[str],
                           votes: List[multipoll.models.FullVoteBase]) \
             -> Optional[Union[bytes, str]]:
         return None
 
 
+# Where each system is defined. Its module is imported, registering it, the first time the key
+# is resolved, so workers only load the systems their polls actually use.
+SYSTEM_MODULES: Dict[str, str] = {
+    "approval": "multipoll.electoralsystems.approval",
+    "borda": "multipoll.electoralsystems.borda",
+    "ranked_pairs": "multipoll.electoralsystems.rankedpairs",
+    **{key: "multipoll.electoralsystems.score"
+       for key in ("sum_score", "median_score", "mean_score",
+                   "sum_score_infinity", "median_score_infinity", "mean_score_infinity",
+                   "sum_score_manhattan", "median_score_manhattan", "mean_score_manhattan")},
+}
+
+
 def get_electoral_system(key: str) -> Type[ElectoralSystem]:
-    return ElectoralSystemMeta.registered_systems[key]
+    system = ElectoralSystemMeta.registered_systems.get(key, None)
+    if system is None and key in SYSTEM_MODULES:
+        importlib.import_module(SYSTEM_MODULES[key])
+        system = ElectoralSystemMeta.registered_systems.get(key, None)
+    if system is None:
+        raise KeyError(key)
+    return system
+
+
+def evaluate_electoral_systems(keys: Iterable[str],
+                               votes: List[multipoll.models.FullVoteBase]) \
+        -> Dict[str, List[float]]:
+    return evaluate_electoral_systems_on_ballots(keys, BallotMatrix.from_votes(votes))
+
+
+def evaluate_electoral_systems_on_ballots(keys: Iterable[str], ballots: BallotMatrix) \
+        -> Dict[str, List[float]]:
+    # Every system scores the same matrix, so rankings, norms and pairwise counts are shared
+    return {key: get_electoral_system(key).generate_batch_scores(ballots) for key in keys}
@@ -13,8 +13,7 @@ class FullApprovalVoteForm(FullVoteFormBase):
 
     _method = forms.CharField(initial="approvalvote", widget=forms.HiddenInput())
 
-    def sanitize_weight(self, weight: Optional[bool]) -> bool:
-        if weight is None or weight in ("off", 0, False, "false", "False", "f", ""):
-            return False
-        else:
-            return True
+    @classmethod
+    def sanitize_weight(cls, weight: Optional[bool]) -> bool:
+        # An option left at "Unknown" is not approved
+        return bool(weight)
@@ -1,26 +1,10 @@
-import random
-from typing import Dict, List, Tuple
-
 from django import forms
 
-from wn import ADJ, NOUN
-from wn import WordNet
-from wn.constants import wordnet_30_dir
+from multipoll.wordlist import get_word_list
 
 
 def get_default_secret(max_word_length: int = 4) -> str:
-    if max_word_length not in _words:
-        nouns = [n for n in _wordnet.all_lemma_names(NOUN)
-                 if n.isalpha() and len(n) <= max_word_length]
-        adjectives = [a for a in _wordnet.all_lemma_names(ADJ)
-                      if a.isalpha() and len(a) <= max_word_length]
-        _words[max_word_length] = (nouns, adjectives)
-    nouns, adjectives = _words[max_word_length]
-    return random.choice(adjectives) + ' ' + random.choice(nouns)
-
-
-_wordnet = WordNet(wordnet_30_dir)
-_words: Dict[int, Tuple[List[str], List[str]]] = {}
+    return get_word_list().secret(max_word_length)
 
 
 def get_fixed_secret() -> str:
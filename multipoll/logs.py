@@ -0,0 +1,120 @@
+import datetime
+import json
+import logging
+import random
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+from django.conf import settings
+
+REDACTED = "[redacted]"
+# Compared case-insensitively against every key of a logged payload, at any depth
+REDACTED_KEYS = frozenset(("token", "trigger_id", "user_secret", "secret", "password",
+                           "authorization", "csrfmiddlewaretoken", "response_url"))
+MAX_VALUE_LENGTH = 200
+MAX_ITEMS = 20
+# Deep enough for a logged Slack payload's actions[].selected_options[] values
+MAX_DEPTH = 8
+
+_STANDARD_ATTRIBUTES = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) \
+    | {"message", "asctime"}
+
+
+def _redact_mapping(value: Mapping, max_length: int, depth: int) -> Any:
+    if depth <= 0:
+        return f"{{...{len(value)} keys}}"
+    items = list(value.items())
+    redacted: Dict[str, Any] = {}
+    for k, v in items[:MAX_ITEMS]:
+        if str(k).lower() in REDACTED_KEYS:
+            redacted[str(k)] = REDACTED
+        else:
+            redacted[str(k)] = redact(v, max_length, depth - 1)
+    if len(items) > MAX_ITEMS:
+        redacted["..."] = f"{len(items) - MAX_ITEMS} more"
+    return redacted
+
+
+def _redact_sequence(value: Sequence, max_length: int, depth: int) -> Any:
+    if depth <= 0:
+        return f"[...{len(value)} items]"
+    redacted = [redact(v, max_length, depth - 1) for v in value[:MAX_ITEMS]]
+    if len(value) > MAX_ITEMS:
+        redacted.append(f"...{len(value) - MAX_ITEMS} more")
+    return redacted
+
+
+def _redact_string(value: str, max_length: int, depth: int) -> Any:
+    if value.startswith("{") and value.endswith("}"):
+        # Slack sends interactive payloads as JSON inside a form field
+        try:
+            return redact(json.loads(value), max_length, depth)
+        except ValueError:
+            pass
+    if len(value) > max_length:
+        return f"{value[:max_length]}...({len(value) - max_length} more chars)"
+    return value
+
+
+def redact(value: Any, max_length: int = MAX_VALUE_LENGTH, depth: int = MAX_DEPTH) -> Any:
+    # Returns a copy that is safe and small enough to log
+    if isinstance(value, Mapping):
+        return _redact_mapping(value, max_length, depth)
+    elif isinstance(value, (list, tuple)):
+        return _redact_sequence(value, max_length, depth)
+    elif isinstance(value, (bytes, bytearray)):
+        return _redact_string(value.decode(errors="replace"), max_length, depth)
+    elif isinstance(value, str):
+        return _redact_string(value, max_length, depth)
+    elif value is None or isinstance(value, (bool, int, float)):
+        return value
+    else:
+        return _redact_string(str(value), max_length, depth)
+
+
+class Redacted:
+    # Defers redaction and serialization until a handler actually formats the record
+    def __init__(self, value: Any, max_length: int = MAX_VALUE_LENGTH):
+        self.value = value
+        self.max_length = max_length
+
+    def __str__(self) -> str:
+        return json.dumps(redact(self.value, self.max_length), default=str)
+
+
+def sampled(endpoint: str) -> bool:
+    rate = settings.LOG_SAMPLE_RATES.get(endpoint, 1.0)
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    # Fields are passed on the record so JsonFormatter can emit them as keys, and are
+    # only rendered if the record is emitted
+    if not logger.isEnabledFor(level):
+        return
+    logger.log(level, "%s %s", event, Redacted(fields), extra={"event": event, "fields": fields})
+
+
+def log_request(logger: logging.Logger, endpoint: str, payload: Any,
+                level: int = logging.INFO) -> None:
+    if logger.isEnabledFor(level) and sampled(endpoint):
+        log_event(logger, level, "request", endpoint=endpoint, payload=payload)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:  # noqa: A003
+        entry: Dict[str, Any] = {
+            "time": datetime.datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        event: Optional[str] = getattr(record, "event", None)
+        if event is not None:
+            entry["event"] = event
+            entry.update(redact(getattr(record, "fields", {})))
+        else:
+            entry["message"] = record.getMessage()
+            entry.update({key: redact(value) for key, value in record.__dict__.items()
+                          if key not in _STANDARD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
@@ -0,0 +1,113 @@
+import argparse
+import json
+import platform
+import time
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+import numpy as np
+
+from multipoll.electoralsystems import get_electoral_system
+from multipoll.electoralsystems.benchmark import BenchmarkResult, Comparison
+from multipoll.electoralsystems.benchmark import DISTRIBUTIONS, FUNCTIONS, OPTION_COUNTS, \
+    VOTER_COUNTS
+from multipoll.electoralsystems.benchmark import compare_results, run_benchmarks
+from multipoll.electoralsystems.utils.registry import SYSTEM_MODULES
+from multipoll.models import PollBase
+
+
+def _csv(choices: Any = None, convert: Any = str) -> Any:
+    def parse(value: str) -> List[Any]:
+        items = [convert(item.strip()) for item in value.split(",") if item.strip()]
+        unknown = [item for item in items if choices is not None and item not in choices]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"Unknown {unknown}, expected some of "
+                                             f"{sorted(choices)}")
+        return items
+    return parse
+
+
+def _load(path: str) -> List[BenchmarkResult]:
+    with open(path) as f:
+        return [BenchmarkResult(**result) for result in json.load(f)["results"]]
+
+
+class Command(BaseCommand):
+    help = ("Times generate_scores, order_options and visualize_results of every electoral "
+            "system on seeded synthetic ballots and saves the timings as JSON, or with "
+            "--compare reports the cases that got slower or faster between two saved runs.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--systems', type=_csv(SYSTEM_MODULES), default=list(SYSTEM_MODULES))
+        parser.add_argument('--functions', type=_csv(FUNCTIONS), default=list(FUNCTIONS))
+        parser.add_argument('--distributions', type=_csv(DISTRIBUTIONS),
+                            default=list(DISTRIBUTIONS))
+        parser.add_argument('--voters', type=_csv(convert=int), default=list(VOTER_COUNTS))
+        parser.add_argument('--options', type=_csv(convert=int), default=list(OPTION_COUNTS))
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Runs per case, the fastest is what gets compared.")
+        parser.add_argument('--max-seconds', type=float, default=5.0,
+                            help="Stop repeating a case after this long, and skip larger "
+                                 "voter counts once a single run takes longer.")
+        parser.add_argument('--output', default=None, help="Write the results to this file.")
+        parser.add_argument('--compare', nargs=2, metavar=("BEFORE", "AFTER"), default=None,
+                            help="Compare two saved runs instead of running the benchmarks.")
+        parser.add_argument('--threshold', type=float, default=0.1,
+                            help="Relative change that counts as a regression, 0.1 is 10%%.")
+        parser.add_argument('--min-ms', type=float, default=0.05,
+                            help="Ignore cases faster than this in both runs.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['compare']:
+            self.compare(*options['compare'], options)
+            return
+        for count in options['options']:
+            if not 1 <= count <= PollBase.MAX_OPTIONS:
+                raise CommandError(f"Option counts must be between 1 and {PollBase.MAX_OPTIONS}")
+        systems = [get_electoral_system(key) for key in options['systems']]
+        started = time.monotonic()
+        results = list(run_benchmarks(
+            systems, options['functions'], options['distributions'], options['voters'],
+            options['options'], options['seed'], options['repeat'], options['max_seconds'],
+            PollBase.MAX_OPTIONS, progress=self.print_result))
+        self.stdout.write(f"{len(results)} cases in {time.monotonic() - started:.1f}s")
+        if options['output']:
+            report: Dict[str, Any] = {
+                "meta": {"seed": options['seed'], "repeat": options['repeat'],
+                         "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                         "python": platform.python_version(), "numpy": np.__version__,
+                         "machine": platform.machine(), "node": platform.node()},
+                "results": [result.as_dict() for result in results],
+            }
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def print_result(self, result: BenchmarkResult) -> None:
+        self.stdout.write(f"{result.system:<24} {result.function:<18} {result.distribution:<9} "
+                          f"{result.voters:>7} voters {result.options:>3} options "
+                          f"{result.min_ms:>10.3f}ms min {result.median_ms:>10.3f}ms median")
+
+    def compare(self, before_path: str, after_path: str, options: Dict[str, Any]) -> None:
+        before, after = _load(before_path), _load(after_path)
+        regressions, improvements = compare_results(before, after, options['threshold'],
+                                                    options['min_ms'])
+        missing = {r.key for r in before} - {r.key for r in after}
+        self.print_comparisons("Regressions", regressions)
+        self.print_comparisons("Improvements", improvements)
+        if missing:
+            self.stdout.write(f"{len(missing)} cases of {before_path} were not run in "
+                              f"{after_path}, e.g. skipped as too slow")
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} cases regressed by more than "
+                               f"{options['threshold']:.0%}")
+
+    def print_comparisons(self, title: str, comparisons: List[Comparison]) -> None:
+        self.stdout.write(f"{title}: {len(comparisons)}")
+        for comparison in comparisons:
+            system, function, distribution, voters, options = comparison.key
+            self.stdout.write(f"  {system:<24} {function:<18} {distribution:<9} {voters:>7} "
+                              f"voters {options:>3} options {comparison.before_ms:>10.3f}ms -> "
+                              f"{comparison.after_ms:>10.3f}ms ({comparison.ratio:.2f}x)")
@@ -0,0 +1,31 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from multipoll.wordlist import WORD_LIST_PATH
+from multipoll.wordlist import WordList
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the word list used for generated secrets from WordNet."
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--max-length', type=int, default=5,
+                            help="Longest word to keep, secrets use up to 4 letters by default.")
+        parser.add_argument('--output', default=WORD_LIST_PATH)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        # Only this command needs WordNet, it takes seconds and hundreds of MB to load
+        from wn import ADJ, NOUN
+        from wn import WordNet
+        from wn.constants import wordnet_30_dir
+
+        wordnet = WordNet(wordnet_30_dir)
+        max_length = options['max_length']
+        adjectives = {a for a in wordnet.all_lemma_names(ADJ)
+                      if a.isalpha() and len(a) <= max_length}
+        nouns = {n for n in wordnet.all_lemma_names(NOUN)
+                 if n.isalpha() and len(n) <= max_length}
+        WordList(adjectives, nouns).save(options['output'])
+        self.stdout.write(f"Wrote {len(adjectives)} adjectives and {len(nouns)} nouns "
+                          f"to {options['output']}")
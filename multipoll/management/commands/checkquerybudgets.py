@@ -0,0 +1,166 @@
+import json
+import os
+import random
+from typing import Any, Callable, Dict, List, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.http import HttpResponse
+from django.test import Client
+
+from multipoll import dataset
+from multipoll.models import ApprovalPoll, MultiPoll, PollBase, User
+from multipoll.models.tally import discard_tally
+from multipoll.querystats import QUERY_BUDGETS
+from multipoll.querystats import track_queries
+from multipoll.slacksimulator import SlackSimulator
+
+Check = Tuple[str, str, Callable[[Client], HttpResponse]]
+
+COMMANDS = {True: "/apoll", False: "/mpoll"}
+VOTE_METHODS = {True: "approvalvote", False: "multivote"}
+
+
+class Command(BaseCommand):
+    help = ("Runs each endpoint against freshly seeded large polls, with and without their "
+            "results cached, and fails if any runs more queries than its budget in "
+            "multipoll.querystats.QUERY_BUDGETS. Needs a database, the polls and users it "
+            "creates are deleted afterwards.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--options', type=int, default=20)
+        parser.add_argument('--voters', type=int, default=2000)
+        parser.add_argument('--partial-fraction', type=float, default=0.3,
+                            help="Share of voters that also have a partial vote.")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--verbose-queries', action='store_true',
+                            help="Print the SQL of endpoints over budget.")
+        parser.add_argument('--json', default=None, help="Also write the results to this file.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        self.random = random.Random(options['seed'])
+        self.token = os.environ.get("MPOLLS_SLACK_VERIFIER", "")
+        self.prefix = f"qb{self.random.randrange(16 ** 6):06x}"
+        self.voter_count = 0
+        channel = self.prefix[:9].upper()
+        host = "localhost"
+        if settings.ALLOWED_HOSTS and settings.ALLOWED_HOSTS[0] not in ("*", ""):
+            host = settings.ALLOWED_HOSTS[0]
+        client = Client(HTTP_HOST=host)
+
+        simulator = SlackSimulator(latency=0.0)
+        results: List[Dict[str, Any]] = []
+        try:
+            # Coalesced Slack updates run on a timer thread, outside the request being measured
+            with simulator.serving(SLACK_USE_OUTBOX=False, SLACK_UPDATE_DELAY=3600):
+                polls = [dataset.create_dataset(poll_model, 1, options['voters'],
+                                                options['options'],
+                                                partial_fraction=options['partial_fraction'],
+                                                seed=self.random.randrange(2 ** 31),
+                                                channel=channel, user_prefix=self.prefix)[0]
+                         for poll_model in (ApprovalPoll, MultiPoll)]
+                for poll in polls:
+                    for cached in (False, True):
+                        for endpoint, label, request in self.checks(poll, channel):
+                            self.prepare(client, poll, cached)
+                            with track_queries(record=True) as stats:
+                                response = request(client)
+                            results.append({
+                                "endpoint": endpoint, "label": label, "cached": cached,
+                                "poll": type(poll).__name__, "status": response.status_code,
+                                "queries": stats.count, "budget": QUERY_BUDGETS[endpoint],
+                                "db_ms": stats.seconds * 1000, "sql": stats.queries})
+        finally:
+            dataset.delete_dataset(channel, self.prefix)
+            User.objects.filter(name__startswith="@" + self.prefix).delete()
+
+        failures = [r for r in results if r["queries"] > r["budget"] or r["status"] >= 400]
+        self.print_results(results, options['verbose_queries'])
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(results, f, indent=2)
+        if failures:
+            raise CommandError(f"{len(failures)} of {len(results)} checks failed")
+
+    def voter(self) -> str:
+        # After the seeded voters, who are named prefix0 to prefix<voters - 1>
+        self.voter_count += 1
+        return f"{self.prefix}v{self.voter_count}"
+
+    def prepare(self, client: Client, poll: PollBase, cached: bool) -> None:
+        if cached:
+            client.get(f"/polls/{poll.timestamp_str}/results")
+        else:
+            discard_tally(poll.timestamp_str)
+            caches[settings.RESULTS_CACHE].clear()
+
+    def slack_post(self, path: str, data: Dict[str, Any]) -> Callable[[Client], HttpResponse]:
+        data = {**data, "token": self.token}
+        return lambda client: client.post(path, data)
+
+    def interaction(self, payload: Dict[str, Any]) -> Callable[[Client], HttpResponse]:
+        return self.slack_post("/slack/interactive", {
+            "payload": json.dumps({**payload, "token": self.token,
+                                   "user": {"name": self.voter()},
+                                   "trigger_id": f"{self.random.randrange(10 ** 12)}.trigger"})})
+
+    def checks(self, poll: PollBase, channel: str) -> List[Check]:
+        timestamp = poll.timestamp_str
+        option = self.random.randrange(len(poll.options))
+        message = {"ts": timestamp}
+        approval = isinstance(poll, ApprovalPoll)
+        checks: List[Check] = [
+            ("slash_poll", "/slack/slash", self.slack_post("/slack/slash", {
+                "channel_id": channel, "command": COMMANDS[approval],
+                "text": '"Query budget" "A" "B" "C"'})),
+            ("interactive_button:addMore", "addMore", self.interaction({
+                "callback_id": "options", "actions": [{"name": "addMore"}],
+                "original_message": message})),
+            ("interactive_button:newOption", "newOption", self.interaction({
+                "callback_id": "newOption", "state": timestamp,
+                "submission": {"new_option": f"Option {option}"}})),
+        ]
+        if approval:
+            checks.append(("interactive_button:bool_option", "bool_option", self.interaction({
+                "callback_id": "options", "original_message": message,
+                "actions": [{"name": "bool_option", "value": str(option)}]})))
+        else:
+            checks.append(("interactive_button:int_option", "int_option", self.interaction({
+                "callback_id": "options", "original_message": message,
+                "actions": [{"name": "int_option", "value": str(option)}]})))
+            checks.append(("interactive_button:int_vote", "int_vote", self.interaction({
+                "callback_id": "int_vote", "state": f"{timestamp}_{option}",
+                "submission": {"weight": str(self.random.randrange(11))}})))
+
+        get_voter, post_voter = self.voter(), self.voter()
+        ballot: Dict[str, str] = {}
+        for i in range(len(poll.options)):
+            if approval:
+                ballot[f"option-{i}"] = str(self.random.random() < 0.5).lower()
+            else:
+                ballot[f"option-{i}"] = str(self.random.randrange(11))
+        checks.append(("vote_on_poll:GET", "GET vote", lambda client: client.get(
+            f"/polls/{timestamp}/vote", {"user_name": get_voter, "user_secret": "budget"})))
+        checks.append(("vote_on_poll:POST", "POST vote", lambda client: client.post(
+            f"/polls/{timestamp}/vote",
+            {"_method": VOTE_METHODS[approval], "poll": timestamp,
+             "user": post_voter, "user_secret": "budget", **ballot})))
+        for system in poll.supported_systems:
+            checks.append(("poll_results", f"results {system}", lambda client, system=system:
+                           client.get(f"/polls/{timestamp}/results", {"system": system})))
+        return checks
+
+    def print_results(self, results: List[Dict[str, Any]], verbose: bool) -> None:
+        self.stdout.write(f"{'poll':<12} {'check':<32} {'cached':<6} {'status':>6} "
+                          f"{'queries':>7} {'budget':>6} {'db ms':>8}")
+        for result in results:
+            over = result["queries"] > result["budget"] or result["status"] >= 400
+            cached = {True: "yes", False: "no"}[result["cached"]]
+            flag = {True: "  OVER", False: ""}[over]
+            self.stdout.write(f"{result['poll']:<12} {result['label']:<32} {cached:<6} "
+                              f"{result['status']:>6} {result['queries']:>7} "
+                              f"{result['budget']:>6} {result['db_ms']:>8.1f}{flag}")
+            if over and verbose:
+                for i, sql in enumerate(result["sql"], 1):
+                    self.stdout.write(f"    {i}. {sql}")
@@ -0,0 +1,63 @@
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from multipoll import dataset
+from multipoll.electoralsystems.benchmark import DISTRIBUTIONS
+from multipoll.models import ApprovalPoll, MultiPoll
+
+POLL_MODELS = {"approval": ApprovalPoll, "multi": MultiPoll}
+
+
+class Command(BaseCommand):
+    help = ("Creates seeded synthetic polls and their votes directly in the database, with "
+            "COPY by default, for benchmarking the database and the views at production "
+            "sizes. Nothing is sent to Slack. The polls share one channel and their voters a "
+            "name prefix, so --delete removes them again.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--poll-type', choices=sorted(POLL_MODELS), default="multi")
+        parser.add_argument('--polls', type=int, default=10)
+        parser.add_argument('--voters', type=int, default=1000, help="Full votes per poll.")
+        parser.add_argument('--options', type=int, default=20)
+        parser.add_argument('--distribution', choices=DISTRIBUTIONS, default="uniform")
+        parser.add_argument('--partial-fraction', type=float, default=0.3,
+                            help="Share of voters that also have partial votes on each poll.")
+        parser.add_argument('--partial-options', type=int, default=1,
+                            help="Partial votes each of those voters has per poll.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--method', choices=dataset.METHODS, default="copy",
+                            help="copy needs Postgres, bulk goes through bulk_create.")
+        parser.add_argument('--channel', default=dataset.CHANNEL)
+        parser.add_argument('--user-prefix', default=dataset.USER_PREFIX)
+        parser.add_argument('--no-analyze', action='store_true',
+                            help="Don't refresh the planner statistics afterwards.")
+        parser.add_argument('--delete', action='store_true',
+                            help="Delete the polls and voters of an earlier run instead.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if options['delete']:
+            deleted = dataset.delete_dataset(options['channel'], options['user_prefix'])
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+        if len(options['channel']) > 9:
+            raise CommandError("Slack channel ids are at most 9 characters")
+        poll_model = POLL_MODELS[options['poll_type']]
+        started = time.monotonic()
+        try:
+            polls = dataset.create_dataset(
+                poll_model, options['polls'], options['voters'], options['options'],
+                options['distribution'], options['partial_fraction'], options['partial_options'],
+                options['seed'], options['channel'], options['user_prefix'], options['method'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        loaded = time.monotonic() - started
+        if not options['no_analyze']:
+            dataset.analyze(poll_model)
+        if not polls:
+            self.stdout.write("No polls created")
+            return
+        self.stdout.write(f"Created {len(polls)} {options['poll_type']} polls with "
+                          f"{options['voters']} voters and {options['options']} options each "
+                          f"in {loaded:.1f}s, e.g. /polls/{polls[0].timestamp_str}/results")
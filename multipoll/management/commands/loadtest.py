@@ -0,0 +1,256 @@
+import json
+import os
+import queue
+import random
+import statistics
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection
+from django.test import Client
+
+from multipoll import slack
+from multipoll.models import PollBase
+from multipoll.slacksimulator import SlackSimulator
+
+DEFAULT_MIX = {"approval": "button=8,add_more=1", "multi": "button=3,int_vote=6,add_more=1"}
+COMMANDS = {"approval": "/apoll", "multi": "/mpoll"}
+BUTTONS = {"approval": "bool_option", "multi": "int_option"}
+INTERACTIONS = ("button", "int_vote", "add_more", "new_option")
+
+
+def _parse_mix(mix: str) -> Dict[str, int]:
+    weights: Dict[str, int] = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in INTERACTIONS:
+            raise CommandError(f"Unknown interaction {name}, expected one of {INTERACTIONS}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def _mean(values: List[float]) -> float:
+    if not values:
+        return 0.0
+    return statistics.mean(values)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class Result:
+    def __init__(self, kind: str, status: int, latency: float, queries: int):
+        self.kind = kind
+        self.status = status
+        self.latency = latency
+        self.queries = queries
+
+
+class Command(BaseCommand):
+    help = ("Replays synthetic /slack/slash and /slack/interactive requests against the app "
+            "with Slack replaced by a local simulator, then reports latency, Slack calls and "
+            "queries per interaction. Needs a database, it creates a poll and its votes.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--interactions', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--poll-type', choices=("approval", "multi"), default="approval")
+        parser.add_argument('--options', type=int, default=5, help="Options on the poll.")
+        parser.add_argument('--voters', type=int, default=50, help="Distinct users voting.")
+        parser.add_argument('--mix', default=None,
+                            help="Weighted interactions, e.g. button=3,int_vote=6,add_more=1")
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help="Seconds the simulated Slack takes per call.")
+        parser.add_argument('--jitter', type=float, default=0.0)
+        parser.add_argument('--rate-limit-probability', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--outbox', action='store_true',
+                            help="Queue Slack calls in the outbox and drain it afterwards "
+                                 "instead of calling the simulator inline.")
+        parser.add_argument('--settle', type=float, default=None,
+                            help="Seconds to wait for coalesced updates before counting "
+                                 "Slack calls, defaults to the update delay plus one.")
+        parser.add_argument('--json', default=None, help="Also write the report to this file.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        self.random = random.Random(options['seed'])
+        mix = _parse_mix(options['mix'] or DEFAULT_MIX[options['poll_type']])
+        if options['poll_type'] == "approval" and "int_vote" in mix:
+            raise CommandError("Approval polls are voted on with buttons, not int_vote dialogs")
+        self.token = os.environ.get("MPOLLS_SLACK_VERIFIER", "")
+        self.host = "localhost"
+        if settings.ALLOWED_HOSTS and settings.ALLOWED_HOSTS[0] not in ("*", ""):
+            self.host = settings.ALLOWED_HOSTS[0]
+
+        simulator = SlackSimulator(latency=options['latency'], jitter=options['jitter'],
+                                   rate_limit_probability=options['rate_limit_probability'],
+                                   seed=options['seed'])
+        with simulator.serving(SLACK_USE_OUTBOX=options['outbox']):
+            timestamp = self.create_poll(options)
+            simulator.reset()
+            stats_before = slack.connection_stats()
+            kinds = self.random.choices(list(mix.keys()), list(mix.values()),
+                                        k=options['interactions'])
+            payloads = [(kind, self.make_payload(kind, timestamp, options)) for kind in kinds]
+            started = time.monotonic()
+            results = self.replay(payloads, options['concurrency'])
+            elapsed = time.monotonic() - started
+            settle = options['settle']
+            if settle is None:
+                settle = max(settings.SLACK_UPDATE_DELAY, 0) + 1
+            time.sleep(settle)
+            if options['outbox']:
+                call_command('slackworker', once=True)
+            stats_after = slack.connection_stats()
+            report = self.report(results, elapsed, simulator, stats_before, stats_after)
+
+        self.print_report(report)
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    def create_poll(self, options: Dict[str, Any]) -> str:
+        channel = f"L{self.random.randrange(16 ** 8):08X}"
+        names = " ".join(f'"Option {i}"' for i in range(options['options']))
+        command = COMMANDS[options['poll_type']]
+        response = Client(HTTP_HOST=self.host).post(
+            "/slack/slash", {"token": self.token, "channel_id": channel, "command": command,
+                             "text": f'"Load test {channel}" {names}'})
+        if response.status_code != 200:
+            raise CommandError(f"Creating the poll failed with {response.status_code}: "
+                               f"{response.content!r}")
+        return PollBase.objects.filter(channel=channel).latest().timestamp_str
+
+    def make_payload(self, kind: str, timestamp: str, options: Dict[str, Any]) -> str:
+        user = {"name": f"loadtest{self.random.randrange(options['voters'])}"}
+        option = self.random.randrange(options['options'])
+        trigger_id = f"{self.random.randrange(10 ** 12)}.trigger"
+        payload: Dict[str, Any]
+        if kind == "button":
+            payload = {"callback_id": "options",
+                       "actions": [{"name": BUTTONS[options['poll_type']], "value": option}],
+                       "original_message": {"ts": timestamp}, "user": user,
+                       "trigger_id": trigger_id}
+        elif kind == "int_vote":
+            payload = {"callback_id": "int_vote", "state": f"{timestamp}_{option}",
+                       "user": user, "submission": {"weight": str(self.random.randrange(11))}}
+        elif kind == "add_more":
+            payload = {"callback_id": "options", "actions": [{"name": "addMore"}],
+                       "original_message": {"ts": timestamp}, "user": user,
+                       "trigger_id": trigger_id}
+        else:
+            payload = {"callback_id": "newOption", "state": timestamp, "user": user,
+                       "submission": {"new_option": f"Option {self.random.randrange(1000)}"}}
+        payload["token"] = self.token
+        return json.dumps(payload)
+
+    def replay(self, payloads: List[Tuple[str, str]], concurrency: int) -> List[Result]:
+        work: queue.Queue = queue.Queue()
+        for item in payloads:
+            work.put(item)
+        results: List[Result] = []
+        results_lock = threading.Lock()
+
+        def worker() -> None:
+            client = Client(HTTP_HOST=self.host)
+            queries = [0]
+
+            def count_query(execute: Any, sql: str, params: Any, many: bool,
+                            context: Dict[str, Any]) -> Any:
+                queries[0] += 1
+                return execute(sql, params, many, context)
+
+            try:
+                with connection.execute_wrapper(count_query):
+                    while True:
+                        try:
+                            kind, payload = work.get_nowait()
+                        except queue.Empty:
+                            return
+                        queries[0] = 0
+                        started = time.monotonic()
+                        response = client.post("/slack/interactive", {"payload": payload})
+                        latency = time.monotonic() - started
+                        with results_lock:
+                            results.append(Result(kind, response.status_code, latency,
+                                                  queries[0]))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, concurrency))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @staticmethod
+    def summarize(results: List[Result], elapsed: Optional[float] = None) -> Dict[str, Any]:
+        latencies = [r.latency * 1000 for r in results]
+        queries = [r.queries for r in results]
+        summary = {
+            "count": len(results),
+            "statuses": dict(Counter(str(r.status) for r in results)),
+            "latency_ms": {"mean": _mean(latencies),
+                           "p50": _percentile(latencies, 50),
+                           "p90": _percentile(latencies, 90),
+                           "p99": _percentile(latencies, 99),
+                           "max": max(latencies, default=0.0)},
+            "queries": {"mean": _mean(queries),
+                        "p90": _percentile(queries, 90),
+                        "max": max(queries, default=0)},
+        }
+        if elapsed is not None:
+            summary["elapsed_s"] = elapsed
+            summary["throughput_rps"] = 0.0
+            if elapsed:
+                summary["throughput_rps"] = len(results) / elapsed
+        return summary
+
+    def report(self, results: List[Result], elapsed: float, simulator: SlackSimulator,
+               stats_before: Dict[str, int], stats_after: Dict[str, int]) -> Dict[str, Any]:
+        # Slack calls can't be attributed to single requests once they are coalesced, so
+        # they are reported per interaction over the whole run
+        interactions = len(results) or 1
+        slack_calls = simulator.summary()
+        client_stats = {key: stats_after.get(key, 0) - stats_before.get(key, 0)
+                        for key in stats_after}
+        return {
+            "overall": self.summarize(results, elapsed),
+            "by_interaction": {kind: self.summarize([r for r in results if r.kind == kind])
+                               for kind in sorted({r.kind for r in results})},
+            "slack": {"calls": slack_calls["calls"],
+                      "calls_per_interaction": slack_calls["calls"] / interactions,
+                      "by_method": slack_calls["by_method"],
+                      "client": client_stats},
+        }
+
+    def print_report(self, report: Dict[str, Any]) -> None:
+        overall = report["overall"]
+        self.stdout.write(f"{overall['count']} interactions in {overall['elapsed_s']:.2f}s "
+                          f"({overall['throughput_rps']:.1f}/s), statuses "
+                          f"{overall['statuses']}")
+        self.stdout.write(f"{'interaction':<12} {'count':>6} {'p50 ms':>8} {'p90 ms':>8} "
+                          f"{'p99 ms':>8} {'max ms':>8} {'queries':>8}")
+        rows = list(report["by_interaction"].items()) + [("all", overall)]
+        for kind, summary in rows:
+            latency = summary["latency_ms"]
+            self.stdout.write(f"{kind:<12} {summary['count']:>6} {latency['p50']:>8.1f} "
+                              f"{latency['p90']:>8.1f} {latency['p99']:>8.1f} "
+                              f"{latency['max']:>8.1f} {summary['queries']['mean']:>8.1f}")
+        slack_report = report["slack"]
+        self.stdout.write(f"Slack calls: {slack_report['calls']} "
+                          f"({slack_report['calls_per_interaction']:.2f} per interaction) "
+                          f"{slack_report['by_method']}")
+        self.stdout.write(f"Slack client: {slack_report['client']}")
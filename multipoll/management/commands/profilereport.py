@@ -0,0 +1,59 @@
+from __future__ import annotations  # noqa: T484
+
+import io
+import pstats
+from collections import Counter
+from typing import Any, List
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from multipoll.profiling import list_dumps, read_tags
+
+SORT_KEYS = {"cumulative": "cumulative", "self": "tottime", "calls": "ncalls"}
+
+
+class Command(BaseCommand):
+    help = ("Merges the request profiles written by ProfilingMiddleware and lists the "
+            "functions where the sampled requests spent the most time.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--dir', default=None,
+                            help="Profile directory, defaults to settings.PROFILE_DIR.")
+        parser.add_argument('--top', type=int, default=30)
+        parser.add_argument('--sort', choices=sorted(SORT_KEYS), default="cumulative")
+        parser.add_argument('--view', default=None, help="Only profiles of this view.")
+        parser.add_argument('--poll', default=None, help="Only profiles of this poll timestamp.")
+        parser.add_argument('--system', default=None,
+                            help="Only profiles of results shown with this electoral system.")
+        parser.add_argument('--min-seconds', type=float, default=0.0,
+                            help="Only profiles of requests at least this slow.")
+        parser.add_argument('--callers', action='store_true',
+                            help="Also list who called each of the top functions.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        directory = options['dir'] or settings.PROFILE_DIR
+        selected: List[str] = []
+        views: Counter[str] = Counter()
+        for dump in list_dumps(directory):
+            tags = read_tags(dump)
+            if any(options[key] is not None and tags.get(key) != options[key]
+                   for key in ("view", "poll", "system")):
+                continue
+            if float(tags.get("seconds") or 0) < options['min_seconds']:
+                continue
+            selected.append(dump)
+            views[str(tags.get("view"))] += 1
+        if not selected:
+            raise CommandError(f"No matching profiles in {directory}")
+
+        output = io.StringIO()
+        stats = pstats.Stats(*selected, stream=output)
+        stats.strip_dirs().sort_stats(SORT_KEYS[options['sort']])
+        stats.print_stats(options['top'])
+        if options['callers']:
+            stats.print_callers(options['top'])
+
+        self.stdout.write(f"{len(selected)} profiles: "
+                          + ", ".join(f"{view} {count}" for view, count in views.most_common()))
+        self.stdout.write(output.getvalue())
@@ -0,0 +1,158 @@
+from __future__ import annotations  # noqa: T484
+
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+# Run in a fresh interpreter under -X importtime, so nothing is imported yet. Prints one JSON
+# line with the phase timings.
+STARTUP_SCRIPT = """
+import json, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.test import Client
+import multipoll.urls
+urls = time.perf_counter()
+client = Client(HTTP_HOST=sys.argv[1])
+requests = []
+for path in sys.argv[2:]:
+    for attempt in ("first", "second"):
+        begin = time.perf_counter()
+        status = client.get(path).status_code
+        requests.append({"path": path, "attempt": attempt, "status": status,
+                         "ms": (time.perf_counter() - begin) * 1000})
+print(json.dumps({"setup_ms": (setup - started) * 1000, "urls_ms": (urls - setup) * 1000,
+                  "requests": requests,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+class ImportNode:
+    def __init__(self, name: str, self_us: int, cumulative_us: int):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children: List[ImportNode] = []
+
+    def as_dict(self, min_us: int, depth: int) -> Dict[str, Any]:
+        node: Dict[str, Any] = {"module": self.name, "self_ms": self.self_us / 1000,
+                                "cumulative_ms": self.cumulative_us / 1000}
+        children = [c for c in self.children if c.cumulative_us >= min_us]
+        if children and depth > 0:
+            node["imports"] = [c.as_dict(min_us, depth - 1) for c in
+                               sorted(children, key=lambda c: c.cumulative_us, reverse=True)]
+        return node
+
+
+def parse_import_times(output: str) -> List[ImportNode]:
+    # -X importtime prints a module after everything it imported, indented two spaces per
+    # level, so children are collected until their parent's line arrives
+    pending: Dict[int, List[ImportNode]] = {}
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        level = max(0, len(indent) - 1) // 2
+        node = ImportNode(name, int(self_us), int(cumulative_us))
+        node.children = pending.pop(level + 1, [])
+        pending.setdefault(level, []).append(node)
+    return pending.get(0, [])
+
+
+def flatten(nodes: List[ImportNode]) -> List[ImportNode]:
+    flat: List[ImportNode] = []
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        flat.append(node)
+        stack.extend(node.children)
+    return flat
+
+
+class Command(BaseCommand):
+    help = ("Starts the app in a fresh interpreter and reports where import time goes, the "
+            "cost of django.setup() and the URLconf, and first versus second request latency.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('paths', nargs='*', default=["/status"],
+                            help="Paths to request after startup.")
+        parser.add_argument('--min-ms', type=float, default=5.0,
+                            help="Leave imports cheaper than this out of the tree.")
+        parser.add_argument('--depth', type=int, default=4)
+        parser.add_argument('--top', type=int, default=20,
+                            help="How many modules to list by their own import time.")
+        parser.add_argument('--prefix', default=None,
+                            help="Only list modules starting with this, e.g. multipoll.")
+        parser.add_argument('--json', default=None, help="Also write the report to this file.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        from django.conf import settings
+        host = "localhost"
+        if settings.ALLOWED_HOSTS and settings.ALLOWED_HOSTS[0] not in ("*", ""):
+            host = settings.ALLOWED_HOSTS[0]
+        env = dict(os.environ)
+        env.setdefault("DJANGO_SETTINGS_MODULE", "multipoll.settings")
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_SCRIPT,
+                                 host, *options['paths']],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                env=env, universal_newlines=True)
+        timings = self.last_json_line(result.stdout)
+        if result.returncode != 0 or timings is None:
+            raise CommandError(f"Startup failed:\n{result.stderr[-4000:]}")
+
+        roots = parse_import_times(result.stderr)
+        min_us = int(options['min_ms'] * 1000)
+        modules = flatten(roots)
+        if options['prefix']:
+            modules = [m for m in modules if m.name.startswith(options['prefix'])]
+        report = {
+            **timings,
+            "import_ms": sum(root.cumulative_us for root in roots) / 1000,
+            "top_self": [{"module": m.name, "self_ms": m.self_us / 1000,
+                          "cumulative_ms": m.cumulative_us / 1000}
+                         for m in sorted(modules, key=lambda m: m.self_us,
+                                         reverse=True)[:options['top']]],
+            "tree": [root.as_dict(min_us, options['depth'])
+                     for root in sorted(roots, key=lambda r: r.cumulative_us, reverse=True)
+                     if root.cumulative_us >= min_us],
+        }
+        self.print_report(report)
+        if options['json']:
+            with open(options['json'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+    @staticmethod
+    def last_json_line(output: str) -> Optional[Dict[str, Any]]:
+        for line in reversed(output.splitlines()):
+            if line.startswith("{"):
+                return json.loads(line)
+        return None
+
+    def print_report(self, report: Dict[str, Any]) -> None:
+        self.stdout.write(f"Imports {report['import_ms']:.1f}ms, django.setup() "
+                          f"{report['setup_ms']:.1f}ms, URLconf {report['urls_ms']:.1f}ms, "
+                          f"max RSS {report['max_rss_kb'] / 1024:.1f}MB")
+        for request in report['requests']:
+            self.stdout.write(f"  {request['attempt']:<6} GET {request['path']} "
+                              f"{request['status']} in {request['ms']:.1f}ms")
+        self.stdout.write("Import tree (cumulative ms):")
+
+        def write_tree(nodes: List[Dict[str, Any]], indent: int) -> None:
+            for node in nodes:
+                self.stdout.write(f"{'  ' * indent}{node['cumulative_ms']:8.1f}  "
+                                  f"{node['module']}")
+                write_tree(node.get("imports", []), indent + 1)
+        write_tree(report['tree'], 1)
+        self.stdout.write("Slowest modules by own import time (ms):")
+        for module in report['top_self']:
+            self.stdout.write(f"  {module['self_ms']:8.1f}  {module['module']}")
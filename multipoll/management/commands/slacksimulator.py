@@ -0,0 +1,38 @@
+import json
+import time
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from multipoll.slacksimulator import SlackSimulator
+
+
+class Command(BaseCommand):
+    help = ("Serves a local stand-in for chat.postMessage, chat.update and dialog.open. "
+            "Run the app with MPOLLS_SLACK_API_URL set to the printed url.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--host', default="127.0.0.1")
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--latency', type=float, default=0.05,
+                            help="Seconds added to every call.")
+        parser.add_argument('--jitter', type=float, default=0.0,
+                            help="Up to this many extra seconds, chosen uniformly per call.")
+        parser.add_argument('--rate-limit-probability', type=float, default=0.0,
+                            help="Fraction of calls answered with 429.")
+        parser.add_argument('--retry-after', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        simulator = SlackSimulator(options['host'], options['port'], options['latency'],
+                                   options['jitter'], options['rate_limit_probability'],
+                                   options['retry_after'], options['seed'])
+        with simulator:
+            self.stdout.write(f"Simulating Slack at {simulator.url}, "
+                              f"GET {simulator.url[:-len('api/')]}calls for a summary")
+            try:
+                while True:
+                    time.sleep(1)
+            except KeyboardInterrupt:
+                pass
+        self.stdout.write(json.dumps(simulator.summary(), indent=2))
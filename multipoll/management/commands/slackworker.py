@@ -0,0 +1,79 @@
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import connection
+
+from multipoll.models import SlackOutboxMessage
+from multipoll.slack import PRIORITY_DIALOG, PRIORITY_MESSAGE
+from multipoll.slackupdates import sweep_updates
+
+logger = logging.getLogger(__name__)
+
+
+def _deliver(message: SlackOutboxMessage) -> None:
+    try:
+        message.deliver()
+    except Exception:  # noqa: B902
+        logger.exception("Unexpected failure delivering %s", message)
+
+
+class Lane:
+    # A thread pool that only claims as many messages as it has idle threads
+    def __init__(self, priority: int, threads: int):
+        self.priority = priority
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.in_flight: List[Future] = []
+
+    def fill(self) -> int:
+        self.in_flight = [f for f in self.in_flight if not f.done()]
+        claimed = SlackOutboxMessage.claim(self.priority, self.threads - len(self.in_flight))
+        for message in claimed:
+            self.in_flight.append(self.executor.submit(_deliver, message))
+        return len(claimed)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+class Command(BaseCommand):
+    help = ("Sends queued Slack dialogs and message updates, dialogs first, and the poll "
+            "updates a web process scheduled but never sent.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--threads', type=int, default=4,
+                            help="Threads sending chat.update and other messages.")
+        parser.add_argument('--dialog-threads', type=int, default=2,
+                            help="Threads reserved for dialog.open.")
+        parser.add_argument('--poll-interval', type=float, default=0.2,
+                            help="Seconds to sleep when the outbox is empty.")
+        parser.add_argument('--sweep-interval', type=float, default=5.0,
+                            help="Seconds between checks for polls whose update was lost.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once the outbox has been drained.")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        dialogs = Lane(PRIORITY_DIALOG, options['dialog_threads'])
+        messages = Lane(PRIORITY_MESSAGE, options['threads'])
+        last_sweep = 0.0
+        try:
+            while True:
+                if time.monotonic() - last_sweep >= options['sweep_interval']:
+                    # With the outbox on this only queues the chat.updates, the lanes send them
+                    sweep_updates()
+                    last_sweep = time.monotonic()
+                # Dialogs are claimed first on every pass so they never queue behind updates
+                claimed = dialogs.fill() + messages.fill()
+                if claimed == 0:
+                    if options['once'] and not dialogs.in_flight and not messages.in_flight:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            logger.info("Stopping Slack worker")
+        finally:
+            dialogs.shutdown()
+            messages.shutdown()
+            connection.close()
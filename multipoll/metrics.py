@@ -0,0 +1,96 @@
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotFound
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client import generate_latest, multiprocess
+
+# With settings.METRICS_DIR set every worker writes its samples to files there, and /metrics
+# sums them over all workers. prometheus_client reads the directory from the environment when
+# it is imported, settings.py exports it.
+
+REQUEST_SECONDS = Histogram("multipoll_request_seconds", "Time spent handling each URL",
+                            ("view", "method", "status"))
+TALLY_SECONDS = Histogram("multipoll_tally_seconds",
+                          "Time spent ordering a poll's options with an electoral system",
+                          ("system", "options"),
+                          buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+SLACK_SECONDS = Histogram("multipoll_slack_request_seconds", "Latency of Slack API calls",
+                          ("method", "status"))
+VOTE_WRITES = Counter("multipoll_vote_writes_total", "Votes written, rate() gives votes/second",
+                      ("kind",))
+
+
+@contextmanager
+def time_tally(system: str, options_count: int) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        TALLY_SECONDS.labels(system, str(options_count)).observe(time.perf_counter() - started)
+
+
+def observe_slack_call(method: str, status: str, seconds: float) -> None:
+    SLACK_SECONDS.labels(method, status).observe(seconds)
+
+
+def count_vote_write(kind: str) -> None:
+    VOTE_WRITES.labels(kind).inc()
+
+
+def _view_name(request: HttpRequest) -> str:
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    return match.url_name or getattr(match.func, "__name__", match.view_name)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        started = time.perf_counter()
+        response = self.get_response(request)
+        REQUEST_SECONDS.labels(_view_name(request), request.method,
+                               str(response.status_code)).observe(time.perf_counter() - started)
+        return response
+
+
+def _registry() -> CollectorRegistry:
+    if settings.METRICS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=settings.METRICS_DIR)
+        return registry
+    return REGISTRY
+
+
+def _authorized(request: HttpRequest) -> bool:
+    # View names, poll sizes and vote rates aren't for the public, so without
+    # MPOLLS_METRICS_TOKEN the endpoint only exists in DEBUG. Scrapers send the token as
+    # a bearer token, e.g. Prometheus' authorization.credentials.
+    if not settings.METRICS_TOKEN:
+        return settings.DEBUG
+    scheme, _, token = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token, settings.METRICS_TOKEN)
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    if not _authorized(request):
+        return HttpResponseNotFound()
+    return HttpResponse(generate_latest(_registry()), content_type=CONTENT_TYPE_LATEST)
+
+
+def worker_exit(pid: Optional[int] = None) -> None:
+    # Call from the server's worker exit hook, e.g. gunicorn's child_exit, so live gauges of
+    # dead workers are dropped
+    if settings.METRICS_DIR:
+        if pid is None:
+            pid = os.getpid()
+        multiprocess.mark_process_dead(pid, settings.METRICS_DIR)
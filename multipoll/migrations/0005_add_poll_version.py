@@ -0,0 +1,18 @@
+# Generated by Django 3.1.13 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multipoll', '0004_fix_partial_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pollbase',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
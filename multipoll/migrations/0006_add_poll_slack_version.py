@@ -0,0 +1,18 @@
+# Generated by Django 3.1.13 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multipoll', '0005_add_poll_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pollbase',
+            name='slack_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
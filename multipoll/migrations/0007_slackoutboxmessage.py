@@ -0,0 +1,39 @@
+# Generated by Django 3.1.13 on 2026-10-18 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multipoll', '0006_add_poll_slack_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlackOutboxMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=50)),
+                ('body', models.JSONField()),
+                ('priority', models.PositiveSmallIntegerField(default=1)),
+                ('use_client_secret', models.BooleanField(default=True)),
+                ('supersede_key', models.CharField(blank=True, max_length=64, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('claimed', models.DateTimeField(null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(null=True)),
+            ],
+            options={
+                'ordering': ('priority', 'id'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='slackoutboxmessage',
+            index=models.Index(fields=['priority', 'id'], name='multipoll_s_priorit_022294_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slackoutboxmessage',
+            index=models.Index(fields=['supersede_key'], name='multipoll_s_superse_f49824_idx'),
+        ),
+    ]
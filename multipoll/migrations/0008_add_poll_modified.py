@@ -0,0 +1,19 @@
+# Generated by Django 3.1.13 on 2026-10-18 15:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multipoll', '0007_slackoutboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pollbase',
+            name='modified',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
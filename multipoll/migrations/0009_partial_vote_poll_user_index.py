@@ -0,0 +1,21 @@
+# Generated by Django 3.1.13 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multipoll', '0008_add_poll_modified'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='partialapprovalvote',
+            index=models.Index(fields=['poll', 'user'], name='multipoll_p_poll_id_34f97c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partialmultivote',
+            index=models.Index(fields=['poll', 'user'], name='multipoll_p_poll_id_d763f9_idx'),
+        ),
+    ]
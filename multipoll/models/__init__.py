@@ -1,9 +1,11 @@
 from multipoll.models.approvalpoll import ApprovalPoll, FullApprovalVote, PartialApprovalVote
 from multipoll.models.multipoll import FullMultiVote, MultiPoll, PartialMultiVote
 from multipoll.models.pollbase import FullVoteBase, PartialVoteBase, PollBase
+from multipoll.models.slackoutbox import SlackOutboxMessage
 from multipoll.models.user import User
+from multipoll.models.votesubmission import submit_vote
 
 __all__ = ["ApprovalPoll", "FullApprovalVote", "PartialApprovalVote",
            "FullMultiVote", "MultiPoll", "PartialMultiVote",
            "FullVoteBase", "PartialVoteBase", "PollBase",
-           "User"]
\ No newline at end of file
+           "SlackOutboxMessage", "User", "submit_vote"]
\ No newline at end of file
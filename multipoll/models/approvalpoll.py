@@ -18,7 +18,7 @@ class ApprovalPoll(PollBase):
     supported_systems = ("approval",)
     default_system = "approval"
 
-    def get_formatted_votes(self, system: Optional[str] = None) -> List[str]:
+    def _format_votes(self, system: Optional[str] = None) -> List[str]:
         return [f"({'' if s is None else s}) {o} "  # noqa: IF100
                 + f"({', '.join([u.name for u, w in votes if w and w not in FALSEY_VALUES])})"
                 for o, votes, s in self.get_all_votes_with_option_and_score(system)]
@@ -1,27 +1,32 @@
 from __future__ import annotations  # noqa: T484
 
+import datetime
 import json
 import logging
 import math
-from collections import defaultdict
-from typing import Any, ClassVar, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from typing import Any, ClassVar, Dict, List, Optional, Sequence, Tuple, Type, TypeVar, Union
 from typing import TYPE_CHECKING
 from typing import cast
 
 from django import forms
+from django.apps import apps
 from django.contrib.postgres.fields import ArrayField
 from django.core.exceptions import PermissionDenied
-from django.db import models
+from django.db import connection, models, transaction
 from django.db.models.base import ModelBase
 from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 from typedmodels.models import TypedModel
 
 from typing_extensions import Protocol
 
-from multipoll import slack
+from multipoll import metrics, slack, slackupdates
 from multipoll.models.fields import TimestampField
+from multipoll.models.resultscache import cached_results, invalidate_results, systems_key
+from multipoll.models.tally import PollTally
+from multipoll.models.tally import cache_tally, discard_tally, get_cached_tally
 from multipoll.models.user import User
 from multipoll.utils import absolute_url_without_request
 
@@ -36,6 +41,8 @@ PartialVote = TypeVar('PartialVote', bound='PartialVoteBase')
 
 logger = logging.getLogger(__name__)
 
+VOTE_CHUNK_SIZE = 2000
+
 
 class ModelState(Protocol):
     adding: bool
@@ -59,6 +66,12 @@ class PollBase(TypedModel):
                                                                             blank=False),
                                                            null=False, blank=False,
                                                            size=MAX_OPTIONS)
+    version: models.PositiveIntegerField[int, int] = models.PositiveIntegerField(default=0,
+                                                                                 null=False)
+    slack_version: models.PositiveIntegerField[int, int] = \
+        models.PositiveIntegerField(default=0, null=False)
+    # Moves together with version, used as Last-Modified for the results pages
+    modified: models.DateTimeField = models.DateTimeField(default=timezone.now, null=False)
 
     supported_systems = ("approval",)
     default_system = "approval"
@@ -69,6 +82,7 @@ class PollBase(TypedModel):
 
         super(PollBase, self).save(*args, **kwargs)
 
+        self.bump_version()
         self.update_poll()
 
     def get_absolute_url(self) -> Optional[str]:
@@ -102,6 +116,10 @@ class PollBase(TypedModel):
         self.timestamp = ts
 
     def update_poll(self) -> None:
+        if self.timestamp_str:
+            slackupdates.schedule_update(self.timestamp_str)
+
+    def send_update(self) -> None:
         newline = '\n'
         text = f"*{self.question}*\n{self.get_absolute_url()}\n" \
                + f"{newline.join(self.get_formatted_votes())}"
@@ -109,16 +127,156 @@ class PollBase(TypedModel):
         slack.update_message(self.channel, self.timestamp_str, text, attachments)
 
     def get_formatted_votes(self, system: Optional[str] = None) -> List[str]:
+        return cached_results(self.timestamp_str, self.version, "formatted",
+                              system or self.default_system,
+                              lambda: self._format_votes(system))
+
+    def _format_votes(self, system: Optional[str] = None) -> List[str]:
         return [f"({'' if s is None else s}) {o} "  # noqa: IF100
                 + f"({', '.join([f'{u.name}[{w}]' for u, w in votes if w is not None])})"
                 for o, votes, s in self.get_all_votes_with_option_and_score(system)]
 
     def visualized_results(self, system: Optional[str] = None) -> Optional[Union[bytes, str]]:
-        return self.visualize_options(self.question, self.options, self.all_votes, system)
+        return cached_results(self.timestamp_str, self.version, "visualization",
+                              system or self.default_system,
+                              lambda: self.visualize_options(self.question, self.options,
+                                                             self.all_votes, system))
 
     def get_all_votes_with_option_and_score(self, system: Optional[str] = None) \
             -> List[Tuple[str, List[Vote], float]]:
-        return self.order_options(self.options, self.all_votes, system)
+        system_cls = self.get_electoral_system(system)
+        with metrics.time_tally(system_cls.key, len(self.options)):
+            return self.tally.order_options(system_cls, self.options)
+
+    def compare_systems(self, systems: Optional[Sequence[str]] = None) \
+            -> List[Tuple[str, List[Optional[float]]]]:
+        if systems is None:
+            systems = self.supported_systems
+        for system in systems:
+            self.get_electoral_system(system)
+        return cached_results(self.timestamp_str, self.version, "comparison",
+                              systems_key(systems), lambda: self._compare_systems(systems))
+
+    def _compare_systems(self, systems: Sequence[str]) \
+            -> List[Tuple[str, List[Optional[float]]]]:
+        from multipoll.electoralsystems.utils import BallotMatrix
+        from multipoll.electoralsystems.utils import evaluate_electoral_systems_on_ballots
+        ballots = BallotMatrix.from_ballots(list(self.tally.ballots.values()), len(self.options))
+        scores = evaluate_electoral_systems_on_ballots(systems, ballots)
+        return [(option, [scores[system][i] if scores[system] else None  # noqa: IF100
+                          for system in systems])
+                for i, option in enumerate(self.options)]
+
+    @property
+    def tally(self) -> PollTally:
+        timestamp = self.timestamp_str
+        cached = None
+        if timestamp:
+            cached = get_cached_tally(timestamp)
+        if cached is not None and cached.version == self.version \
+                and cached.options_count == len(self.options):
+            return cached
+        current = PollTally(self.version, len(self.options), dict(self.effective_ballots()))
+        if timestamp:
+            cache_tally(timestamp, current)
+        return current
+
+    def bump_version(self, locked: bool = False) -> None:
+        # A caller holding this row from select_for_update already knows the current version,
+        # which saves reading it back
+        if locked:
+            self.version += 1
+            self.modified = timezone.now()
+            PollBase.objects.filter(pk=self.pk).update(version=self.version,
+                                                       modified=self.modified)
+        else:
+            # Reads the new version back in the same statement, refresh_from_db costs a SELECT
+            # and on a TypedModel another one for the type
+            table = connection.ops.quote_name(PollBase._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    UPDATE {table} SET version = version + 1, modified = now()
+                    WHERE timestamp = %s
+                    RETURNING version, modified
+                """, [PollBase._meta.get_field('timestamp').get_prep_value(self.timestamp)])
+                self.version, self.modified = cursor.fetchone()
+        timestamp, previous = self.timestamp_str, self.version - 1
+        transaction.on_commit(lambda: invalidate_results(timestamp, previous,
+                                                         self.supported_systems))
+
+    def update_tally(self, user: User) -> None:
+        timestamp = self.timestamp_str
+        if not timestamp:
+            return
+        cached = get_cached_tally(timestamp)
+        if cached is None:
+            return
+        elif cached.version != self.version - 1 or cached.options_count != len(self.options):
+            discard_tally(timestamp)
+        else:
+            cached.apply(user, self.get_effective_ballot(user))
+            cached.version = self.version
+
+    def effective_ballots(self) -> List[Tuple[User, List[Optional[Any]]]]:
+        # One query that overlays the non-null partial votes onto each full vote inside
+        # Postgres and returns a single options-long weights array per voter, so nothing is
+        # merged or instantiated per partial vote here.
+        FullVoteType = getattr(self, "FullVoteType")  # noqa: N806
+        PartialVoteType = getattr(self, "PartialVoteType")  # noqa: N806
+        quote = connection.ops.quote_name
+        sql = f"""
+            WITH full_vote AS (
+                SELECT user_id, weights FROM {quote(FullVoteType._meta.db_table)}
+                WHERE poll_id = %(poll)s
+            ), partial_vote AS (
+                SELECT user_id, array_agg(option ORDER BY option) AS options,
+                       array_agg(weight ORDER BY option) AS weights
+                FROM {quote(PartialVoteType._meta.db_table)}
+                WHERE poll_id = %(poll)s AND weight IS NOT NULL
+                GROUP BY user_id
+            )
+            SELECT COALESCE(full_vote.user_id, partial_vote.user_id) AS voter,
+                   ARRAY(SELECT COALESCE(partial_vote.weights[array_position(partial_vote.options,
+                                                                             i - 1)],
+                                         full_vote.weights[i])
+                         FROM generate_series(1, %(options_count)s) AS i ORDER BY i)
+            FROM full_vote FULL OUTER JOIN partial_vote ON partial_vote.user_id = full_vote.user_id
+            ORDER BY full_vote.user_id IS NULL, voter
+        """
+        params = {'poll': self._meta.get_field('timestamp').get_prep_value(self.timestamp),
+                  'options_count': len(self.options)}
+        ballots: List[Tuple[User, List[Optional[Any]]]] = []
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for rows in iter(lambda: cursor.fetchmany(VOTE_CHUNK_SIZE), []):
+                ballots.extend((User.from_db(self._state.db, ('name',), (user_id,)), weights)
+                               for user_id, weights in rows)
+        return ballots
+
+    def get_user_vote(self, user: User) -> Optional[FullVote]:
+        # One voter's effective ballot from two indexed queries, merged like all_votes does for
+        # everyone. As there, the partial votes are merged in memory so it must not be saved.
+        FullVoteType = getattr(self, "FullVoteType")  # noqa: N806
+        PartialVoteType = getattr(self, "PartialVoteType")  # noqa: N806
+        vote = getattr(self, FullVoteType.name.lower() + "_set").filter(user=user).first()
+        partial_weights = list(getattr(self, PartialVoteType.name.lower() + "_set")
+                               .filter(user=user, weight__isnull=False)
+                               .values_list('option', 'weight'))
+        if vote is None:
+            if not partial_weights:
+                return None
+            vote = FullVoteType(poll=self, user=user, weights=default_options_inner())
+        else:
+            vote.poll = self
+            vote.user = user
+            vote.weights = list(vote.weights)
+        for option, weight in partial_weights:
+            vote.weights[option] = weight
+        return vote
+
+    def get_effective_ballot(self, user: User) -> Optional[List[Optional[Any]]]:
+        vote = self.get_user_vote(user)
+        return None if vote is None else vote.weights  # noqa: IF100
 
     @property
     def formatted_votes(self) -> List[str]:
@@ -133,13 +291,19 @@ class PollBase(TypedModel):
 
     @property
     def all_votes(self) -> Dict[User, FullVote]:
+        # Query budget: two queries per poll whatever its size, one streaming the full votes
+        # and one streaming the non-null partial votes. Users are rebuilt from user_id (their
+        # name is the primary key) so no per-vote user loads happen. The returned votes are
+        # fresh instances holding each user's effective ballot and must not be saved back.
         votes = self.full_votes
-        partial_votes = self.partial_votes
-        for user, vote in partial_votes.items():
+        for user, vote in self.partial_votes.items():
             if user in votes:
+                merged = votes[user]
+                weights = list(merged.weights)
                 for i, weight in enumerate(vote.weights):
                     if weight is not None:
-                        votes[user].weights[i] = weight
+                        weights[i] = weight
+                merged.weights = weights
             else:
                 votes[user] = vote
         return votes
@@ -150,25 +314,38 @@ class PollBase(TypedModel):
 
     @property
     def partial_votes(self) -> Dict[User, FullVote]:
+        # One query, streamed, and one unsaved FullVote per voter rather than per partial vote
         FullVoteType = getattr(self, "FullVoteType")  # noqa: N806
-        votes: Dict[User, FullVote] = defaultdict(FullVoteType)
         PartialVoteType = getattr(self, "PartialVoteType")  # noqa: N806
         partial_vote_set = PartialVoteType.name.lower() + "_set"
-        for vote in getattr(self, partial_vote_set).all():
-            if vote.weight is not None:
-                votes[vote.user].weights[vote.option] = vote.weight
-                votes[vote.user].user = vote.user
-                votes[vote.user].poll = self
+        rows = getattr(self, partial_vote_set).filter(weight__isnull=False) \
+            .values_list('user_id', 'option', 'weight').iterator(chunk_size=VOTE_CHUNK_SIZE)
+        votes: Dict[User, FullVote] = {}
+        users: Dict[str, User] = {}
+        for user_id, option, weight in rows:
+            user = users.get(user_id, None)
+            if user is None:
+                user = users[user_id] = User.from_db(self._state.db, ('name',), (user_id,))
+                votes[user] = FullVoteType(poll=self, user=user, weights=default_options_inner())
+            votes[user].weights[option] = weight
         return votes
 
     @property
     def full_votes(self) -> Dict[User, FullVote]:
+        # One query, streamed, built with from_db so the instances behave as if fetched
         FullVoteType = getattr(self, "FullVoteType")  # noqa: N806
-        votes: Dict[User, FullVote] = defaultdict(FullVoteType)
         full_vote_set = FullVoteType.name.lower() + "_set"
-        vote: FullVote
-        for vote in getattr(self, full_vote_set).all():
-            votes[vote.user] = vote
+        field_names = [f.attname for f in FullVoteType._meta.concrete_fields]
+        user_index = field_names.index('user_id')
+        rows = getattr(self, full_vote_set).values_list(*field_names) \
+            .iterator(chunk_size=VOTE_CHUNK_SIZE)
+        votes: Dict[User, FullVote] = {}
+        for row in rows:
+            vote = FullVoteType.from_db(self._state.db, field_names, row)
+            user = User.from_db(self._state.db, ('name',), (row[user_index],))
+            vote.poll = self
+            vote.user = user
+            votes[user] = vote
         return votes
 
     @classmethod
@@ -195,6 +372,47 @@ class PollBase(TypedModel):
         system_cls = cls.get_electoral_system(system)
         return system_cls.visualize_results(question, options, list(votes.values()))
 
+    @classmethod
+    def append_option(cls, timestamp: str, option: str) -> Tuple[int, bool]:
+        # Appends in place with array_append, so concurrent appends and votes can't overwrite
+        # each other. Returns the option's index and whether it was added, an option already on
+        # the poll is left where it is.
+        quote = connection.ops.quote_name
+        table = quote(PollBase._meta.db_table)
+        params = {'poll': PollBase._meta.get_field('timestamp').get_prep_value(timestamp),
+                  'option': option, 'max_options': cls.MAX_OPTIONS}
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                UPDATE {table}
+                SET options = array_append(options, %(option)s::varchar),
+                    version = version + 1, modified = now()
+                WHERE timestamp = %(poll)s AND NOT (%(option)s = ANY(options))
+                      AND cardinality(options) < %(max_options)s
+                RETURNING cardinality(options) - 1, version, type
+            """, params)
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute(f"""
+                    SELECT array_position(options, %(option)s::varchar) - 1
+                    FROM {table} WHERE timestamp = %(poll)s
+                """, params)
+                existing = cursor.fetchone()
+        if row is None:
+            if existing is None:
+                raise Http404("No such poll")
+            elif existing[0] is None:
+                raise ValueError(f"Polls can have at most {cls.MAX_OPTIONS} options")
+            return existing[0], False
+        index, version, poll_type = row
+
+        key = TimestampField.normalize_to_timestamp(timestamp)
+        systems = apps.get_model(poll_type).supported_systems
+        transaction.on_commit(lambda: invalidate_results(key, version - 1, systems))
+        # The tally is rebuilt once it sees the new option count
+        discard_tally(key)
+        slackupdates.schedule_update(key)
+        return index, True
+
     @classmethod
     def add(cls: Type[Poll], channel: str, question: str, options: List[str]) -> Poll:
         return cls.objects.create(channel=channel, question=question, options=options)
@@ -203,6 +421,11 @@ class PollBase(TypedModel):
     def timestamped(cls: Type[Poll], timestamp: str) -> Poll:
         return get_object_or_404(cls, timestamp=timestamp)
 
+    @classmethod
+    def revision(cls, timestamp: str) -> Optional[Tuple[int, datetime.datetime]]:
+        # Only reads the poll row, so callers can tell if results changed without the votes
+        return cls.objects.filter(timestamp=timestamp).values_list('version', 'modified').first()
+
 
 def default_options_inner() -> List[Optional[int]]:
     return [None for _ in range(PollBase.MAX_OPTIONS)]
@@ -249,9 +472,17 @@ class FullVoteBase(models.Model, metaclass=FullVoteMeta):
                                                             null=False)
 
     def save(self, *args: Any, **kwargs: Any) -> None:
-        super(FullVoteBase, self).save(*args, **kwargs)
+        with transaction.atomic():
+            self.poll.bump_version()
+            self.save_row(*args, **kwargs)
+        metrics.count_vote_write("full")
+        self.poll.update_tally(self.user)
         self.poll.update_poll()
 
+    def save_row(self, *args: Any, **kwargs: Any) -> None:
+        # Only writes the row, for callers that bump the version and update the poll themselves
+        super(FullVoteBase, self).save(*args, **kwargs)
+
     def get_form(self) -> forms.ModelForm:
         ...
 
@@ -301,7 +532,8 @@ class PartialVoteMeta(ModelBase):
             setattr(_meta, "constraints", (models.UniqueConstraint(fields=('poll', 'option',
                                                                            'user',),
                                                                    name=f'Single{name}Copy'),))
-            setattr(_meta, "indexes", (models.Index(fields=('poll',)),))
+            setattr(_meta, "indexes", (models.Index(fields=('poll',)),
+                                       models.Index(fields=('poll', 'user'))))
             setattr(_meta, "ordering", ('poll', 'option', 'user'))
 
         new_type = cast(Type[PartialVote], super().__new__(mcs, name, bases, attrs))
@@ -325,9 +557,67 @@ class PartialVoteBase(models.Model, metaclass=PartialVoteMeta):
                                                             null=False)
 
     def save(self, *args: Any, **kwargs: Any) -> None:
-        super(PartialVoteBase, self).save(*args, **kwargs)
+        with transaction.atomic():
+            self.poll.bump_version()
+            super(PartialVoteBase, self).save(*args, **kwargs)
+        metrics.count_vote_write("partial")
+        self.poll.update_tally(self.user)
         self.poll.update_poll()
 
+    @classmethod
+    def write_weight(cls, timestamp: str, user_name: str, option: int,
+                     weight: Optional[Any] = None, toggle: bool = False) -> Optional[Any]:
+        # A single statement, so one round trip with no window between reading and writing
+        # the weight: creates the user if needed, bumps the poll's version (checking the option
+        # exists) and inserts or updates the partial vote, returning the stored weight. Toggling
+        # treats a missing or null weight as False, like the button always has.
+        quote = connection.ops.quote_name
+        table = quote(cls._meta.db_table)
+        if toggle:
+            inserted, updated = "TRUE", "NOT COALESCE(vote.weight, FALSE)"
+        else:
+            inserted, updated = "%(weight)s", "EXCLUDED.weight"
+        sql = f"""
+            WITH voter AS (
+                INSERT INTO {quote(User._meta.db_table)} (name) VALUES (%(user)s)
+                ON CONFLICT (name) DO NOTHING
+            ), poll AS (
+                UPDATE {quote(PollBase._meta.db_table)}
+                SET version = version + 1, modified = now()
+                WHERE timestamp = %(poll)s AND type = %(poll_type)s
+                      AND cardinality(options) > %(option)s
+                RETURNING timestamp, version
+            )
+            INSERT INTO {table} AS vote (poll_id, option, user_id, weight)
+            SELECT poll.timestamp, %(option)s, %(user)s, {inserted} FROM poll
+            ON CONFLICT (poll_id, option, user_id) DO UPDATE SET weight = {updated}
+            RETURNING vote.weight, (SELECT version FROM poll)
+        """
+        weight_field = cls._meta.get_field('weight')
+        params = {'user': user_name, 'option': option,
+                  'poll': PollBase._meta.get_field('timestamp').get_prep_value(timestamp),
+                  'poll_type': getattr(cls.poll_model, '_typedmodels_type'),
+                  'weight': weight_field.get_prep_value(weight_field.to_python(weight))}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row is None:
+            raise Http404("No such poll or option")
+        new_weight, version = row
+        metrics.count_vote_write("partial")
+
+        key = TimestampField.normalize_to_timestamp(timestamp)
+        transaction.on_commit(lambda: invalidate_results(key, version - 1,
+                                                         cls.poll_model.supported_systems))
+        cached = get_cached_tally(key)
+        if cached is not None:
+            # A null weight uncovers the voter's full vote, which we haven't read
+            if new_weight is None \
+                    or not cached.apply_weight(version, User(name=user_name), option, new_weight):
+                discard_tally(key)
+        slackupdates.schedule_update(key)
+        return new_weight
+
     @property
     def chosen_option(self) -> str:
         return self.poll.options[self.option]
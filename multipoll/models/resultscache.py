@@ -0,0 +1,70 @@
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, Optional, Sequence, TypeVar
+
+from django.conf import settings
+from django.core.cache import BaseCache
+from django.core.cache import caches
+
+T = TypeVar('T')
+
+# Rendered results keyed by (poll, version, kind, system). Entries of an older version can
+# never be read again since every change bumps the version, invalidation just frees them early.
+# Eviction is left to the backend, settings.CACHES bounds it with MAX_ENTRIES and the default
+# local memory backend evicts least recently used first.
+KINDS = ("formatted", "visualization", "comparison")
+
+_MISSING = object()
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+def _cache() -> BaseCache:
+    return caches[settings.RESULTS_CACHE]
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def results_key(timestamp: str, version: int, kind: str, system: str) -> str:
+    return f"multipoll:results:{timestamp}:{version}:{kind}:{system}"
+
+
+def systems_key(systems: Sequence[str]) -> str:
+    return ",".join(systems)
+
+
+def cached_results(timestamp: Optional[str], version: int, kind: str, system: str,
+                   compute: Callable[[], T]) -> T:
+    if not timestamp:
+        return compute()
+    key = results_key(timestamp, version, kind, system)
+    cache = _cache()
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        _count("misses")
+        value = compute()
+        cache.set(key, value)
+    else:
+        _count("hits")
+    return value
+
+
+def invalidate_results(timestamp: Optional[str], version: int, systems: Iterable[str]) -> None:
+    if not timestamp:
+        return
+    systems = list(systems)
+    keys = [results_key(timestamp, version, kind, system)
+            for kind in KINDS for system in systems]
+    keys.append(results_key(timestamp, version, "comparison", systems_key(systems)))
+    _cache().delete_many(keys)
+    _count("invalidations")
+
+
+def results_cache_stats() -> Dict[str, int]:
+    with _stats_lock:
+        stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        stats.update(_stats)
+        return stats
@@ -0,0 +1,109 @@
+from __future__ import annotations  # noqa: T484
+
+import datetime
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.db import models, transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+import requests
+
+from multipoll import slack
+from multipoll.slack import PRIORITY_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+
+class SlackOutboxMessage(models.Model):
+    class Meta:
+        ordering = ('priority', 'id')
+        indexes = (models.Index(fields=('priority', 'id')),
+                   models.Index(fields=('supersede_key',)))
+
+    MAX_ATTEMPTS = 5
+    CLAIM_TIMEOUT = datetime.timedelta(minutes=2)
+
+    method: models.CharField[str, str] = models.CharField(max_length=50, null=False)
+    body: models.JSONField = models.JSONField(null=False)
+    priority: models.PositiveSmallIntegerField[int, int] = \
+        models.PositiveSmallIntegerField(default=PRIORITY_MESSAGE, null=False)
+    use_client_secret: models.BooleanField[bool, bool] = models.BooleanField(default=True)
+    # Messages sharing a key replace each other while unsent, e.g. chat.update of one poll
+    supersede_key: models.CharField[Optional[str], Optional[str]] = \
+        models.CharField(max_length=64, null=True, blank=True)
+    created: models.DateTimeField = models.DateTimeField(auto_now_add=True)
+    claimed: models.DateTimeField = models.DateTimeField(null=True)
+    attempts: models.PositiveSmallIntegerField[int, int] = \
+        models.PositiveSmallIntegerField(default=0, null=False)
+    last_error: models.TextField[Optional[str], Optional[str]] = models.TextField(null=True)
+
+    def __str__(self) -> str:
+        return f"{self.method}#{self.pk}"
+
+    @classmethod
+    def enqueue(cls, method: str, body: Dict[str, Any], priority: int = PRIORITY_MESSAGE,
+                use_client_secret: bool = True,
+                supersede_key: Optional[str] = None) -> SlackOutboxMessage:
+        with transaction.atomic():
+            if supersede_key is not None:
+                cls.objects.filter(supersede_key=supersede_key, claimed__isnull=True,
+                                   attempts__lt=cls.MAX_ATTEMPTS).delete()
+            return cls.objects.create(method=method, body=body, priority=priority,
+                                      use_client_secret=use_client_secret,
+                                      supersede_key=supersede_key)
+
+    @classmethod
+    def claim(cls, priority: int, limit: int) -> List[SlackOutboxMessage]:
+        if limit <= 0:
+            return []
+        now = timezone.now()
+        unclaimed = Q(claimed__isnull=True) | Q(claimed__lt=now - cls.CLAIM_TIMEOUT)
+        # Never hand out a message while an older one with the same key is still in flight,
+        # otherwise a stale chat.update could land after a newer one. Of the unclaimed ones
+        # only the newest per key is handed out, an older one left after a failed delivery
+        # must not go out beside it.
+        in_flight = cls.objects.filter(supersede_key=OuterRef('supersede_key'),
+                                       claimed__gte=now - cls.CLAIM_TIMEOUT)
+        newer = cls.objects.filter(supersede_key=OuterRef('supersede_key'), id__gt=OuterRef('id'),
+                                   attempts__lt=cls.MAX_ATTEMPTS)
+        with transaction.atomic():
+            ids = list(cls.objects.select_for_update(skip_locked=True)
+                       .filter(unclaimed, priority=priority, attempts__lt=cls.MAX_ATTEMPTS)
+                       .annotate(blocked=Exists(in_flight), superseded=Exists(newer))
+                       .filter(blocked=False, superseded=False)
+                       .values_list('id', flat=True)[:limit])
+            if ids:
+                cls.objects.filter(id__in=ids).update(claimed=now)
+        return list(cls.objects.filter(id__in=ids))
+
+    def superseded(self) -> bool:
+        # enqueue only replaces unclaimed messages, so one may have been queued while this was
+        # being sent
+        return self.supersede_key is not None and SlackOutboxMessage.objects.filter(
+            supersede_key=self.supersede_key, id__gt=self.pk,
+            attempts__lt=self.MAX_ATTEMPTS).exists()
+
+    def deliver(self) -> None:
+        # Any failure counts as an attempt, so a message that always fails (a bad body, a
+        # bug) doesn't come back every CLAIM_TIMEOUT forever. After MAX_ATTEMPTS it stays in
+        # the table with its last error as a dead letter, claim() no longer hands it out.
+        try:
+            slack.call_method(self.method, self.body, self.use_client_secret)
+        except Exception as e:  # noqa: B902
+            if self.superseded():
+                logger.info("Dropping failed Slack %s, a newer message replaces it", self)
+                SlackOutboxMessage.objects.filter(pk=self.pk).delete()
+                return
+            attempts = self.attempts + 1
+            if attempts >= self.MAX_ATTEMPTS:
+                logger.error("Giving up on Slack %s after %d attempts: %r", self, attempts, e)
+            elif isinstance(e, requests.RequestException):
+                logger.warning("Slack %s failed on attempt %d: %s", self, attempts, e)
+            else:
+                logger.exception("Slack %s failed on attempt %d", self, attempts)
+            SlackOutboxMessage.objects.filter(pk=self.pk) \
+                .update(claimed=None, attempts=F('attempts') + 1, last_error=repr(e))
+        else:
+            SlackOutboxMessage.objects.filter(pk=self.pk).delete()
@@ -0,0 +1,97 @@
+from __future__ import annotations  # noqa: T484
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Type
+from typing import TYPE_CHECKING
+
+from multipoll.models.user import User
+
+if TYPE_CHECKING:
+    from multipoll.electoralsystems.utils import Accumulator, ElectoralSystem
+
+Ballot = List[Optional[Any]]
+
+MAX_CACHED_TALLIES = 64
+
+
+class PollTally:
+    version: int
+    options_count: int
+    ballots: Dict[User, Ballot]
+    accumulators: Dict[str, Accumulator]
+    lock: threading.RLock
+
+    def __init__(self, version: int, options_count: int, ballots: Dict[User, Ballot]):
+        self.version = version
+        self.options_count = options_count
+        self.ballots = ballots
+        self.accumulators = {}
+        self.lock = threading.RLock()
+
+    def accumulator(self, system: Type[ElectoralSystem]) -> Accumulator:
+        with self.lock:
+            if system.key not in self.accumulators:
+                self.accumulators[system.key] = system.accumulate(self.ballots.values(),
+                                                                  self.options_count)
+            return self.accumulators[system.key]
+
+    def apply(self, user: User, ballot: Optional[Ballot]) -> None:
+        with self.lock:
+            old_ballot = self.ballots.get(user, None)
+            for accumulator in self.accumulators.values():
+                accumulator.apply(old_ballot, ballot)
+            if ballot is None:
+                self.ballots.pop(user, None)
+            else:
+                self.ballots[user] = ballot
+
+    def apply_weight(self, version: int, user: User, option: int, weight: Optional[Any]) -> bool:
+        # Patches the single weight changed by the write that produced `version`. False when
+        # this tally isn't exactly one version behind and has to be rebuilt instead.
+        with self.lock:
+            if self.version != version - 1 or not 0 <= option < self.options_count:
+                return False
+            old_ballot = self.ballots.get(user, None)
+            ballot: List[Optional[Any]]
+            if old_ballot is None:
+                ballot = [None] * self.options_count
+            else:
+                ballot = list(old_ballot)
+            ballot[option] = weight
+            self.apply(user, ballot)
+            self.version = version
+            return True
+
+    def order_options(self, system: Type[ElectoralSystem], options: List[str]) \
+            -> List[Tuple[str, List[Tuple[User, Optional[Any]]], float]]:
+        with self.lock:
+            return system.order_accumulated(options, list(self.ballots.items()),
+                                            self.accumulator(system))
+
+
+# Per-process and keyed by poll timestamp. Entries are only trusted while their version
+# matches the poll row, so other workers' writes simply force a rebuild.
+_tallies: OrderedDict[str, PollTally] = OrderedDict()
+_tallies_lock = threading.Lock()
+
+
+def get_cached_tally(timestamp: str) -> Optional[PollTally]:
+    with _tallies_lock:
+        tally = _tallies.get(timestamp, None)
+        if tally is not None:
+            _tallies.move_to_end(timestamp)
+        return tally
+
+
+def cache_tally(timestamp: str, tally: PollTally) -> None:
+    with _tallies_lock:
+        _tallies[timestamp] = tally
+        _tallies.move_to_end(timestamp)
+        while len(_tallies) > MAX_CACHED_TALLIES:
+            _tallies.popitem(last=False)
+
+
+def discard_tally(timestamp: str) -> None:
+    with _tallies_lock:
+        _tallies.pop(timestamp, None)
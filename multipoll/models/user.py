@@ -41,7 +41,7 @@ class User(models.Model):
 
     @staticmethod
     def find_or_create(user: Union[Dict, str]) -> User:
-        logger.info(f"Attempting to find or create user from {user} with type {type(user)}")
+        logger.debug("Attempting to find or create user from %r", user)
         if isinstance(user, dict):
             user_name = user['name']
         elif isinstance(user, str):
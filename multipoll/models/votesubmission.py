@@ -0,0 +1,45 @@
+from __future__ import annotations  # noqa: T484
+
+from typing import Any, Callable, List, Optional, Type
+
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+
+from multipoll import metrics
+from multipoll.models.pollbase import FullVoteBase, PollBase
+from multipoll.models.user import User
+
+WeightsReader = Callable[[PollBase], List[Optional[Any]]]
+
+
+def submit_vote(vote_model: Type[FullVoteBase], poll_timestamp: str, user_name: str,
+                user_secret: Optional[str], read_weights: WeightsReader) -> FullVoteBase:
+    # One unit of work for a web ballot. Queries, in order:
+    #   1. SELECT the poll FOR UPDATE, serializing submissions to the same poll
+    #   2. SELECT the user (a first-time voter adds a savepoint and INSERT, 3 more)
+    #   3. SELECT the voter's existing ballot FOR UPDATE
+    #   4. UPDATE the poll's version, the row is locked so it needn't be read back
+    #   5. INSERT or UPDATE the ballot
+    # After commit the cached tally, if any, is patched with this voter's merged ballot (2
+    # queries, none when nothing is cached) and one coalesced Slack update is scheduled.
+    # read_weights validates the posted weights against the locked poll and may raise
+    # ValidationError, which rolls everything back.
+    with transaction.atomic():
+        poll = get_object_or_404(vote_model.poll_model.objects.select_for_update(),
+                                 timestamp=poll_timestamp)
+        user = User.objects.get_or_create(name=user_name)[0]
+        vote = vote_model.objects.select_for_update().filter(poll=poll, user=user).first()
+        if vote is None:
+            vote = vote_model(poll=poll, user=user, user_secret=user_secret)
+        elif vote.user_secret != user_secret:
+            raise PermissionDenied()
+        vote.poll = poll
+        vote.user = user
+        vote.weights = read_weights(poll)
+        poll.bump_version(locked=True)
+        vote.save_row()
+    metrics.count_vote_write("full")
+    poll.update_tally(user)
+    poll.update_poll()
+    return vote
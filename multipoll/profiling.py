@@ -0,0 +1,113 @@
+from __future__ import annotations  # noqa: T484
+
+import cProfile
+import glob
+import hmac
+import json
+import os
+import random
+import re
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpRequest, HttpResponse
+
+# Each dump is a pstats file, <time>-<pid>-<view>.prof, next to a .json file with its tags
+DUMP_SUFFIX = ".prof"
+TAGS_SUFFIX = ".json"
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _request_tags(request: HttpRequest) -> Dict[str, Optional[str]]:
+    match = getattr(request, "resolver_match", None)
+    view = None
+    poll_timestamp = None
+    if match is not None:
+        view = match.url_name or match.func.__name__
+        poll_timestamp = match.kwargs.get("poll_timestamp")
+    if poll_timestamp is None and "payload" in request.POST:
+        # Slack interactions carry the poll in the dialog state or the message they came from
+        try:
+            payload = json.loads(request.POST["payload"])
+            poll_timestamp = (payload.get("state") or "").split("_")[0] \
+                or payload.get("original_message", {}).get("ts")
+        except (ValueError, AttributeError):
+            pass
+    return {
+        "view": view,
+        "url": request.get_full_path(),
+        "method": request.method,
+        "poll": poll_timestamp,
+        "system": request.GET.get("system") or request.GET.get("systems") or None,
+    }
+
+
+def list_dumps(directory: str) -> List[str]:
+    # Oldest first, the file names start with the time they were written
+    return sorted(glob.glob(os.path.join(directory, f"*{DUMP_SUFFIX}")))
+
+
+def read_tags(dump: str) -> Dict[str, Optional[str]]:
+    try:
+        with open(dump[:-len(DUMP_SUFFIX)] + TAGS_SUFFIX) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _rotate(directory: str, keep: int) -> None:
+    for dump in list_dumps(directory)[:-keep or None]:
+        for path in (dump, dump[:-len(DUMP_SUFFIX)] + TAGS_SUFFIX):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class ProfilingMiddleware:
+    # Off unless MPOLLS_PROFILE_SAMPLE_RATE or MPOLLS_PROFILE_TOKEN is set, in which case
+    # Django drops it from the chain entirely. Otherwise an unsampled request costs one
+    # random() and a header lookup.
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        if settings.PROFILE_SAMPLE_RATE <= 0 and not settings.PROFILE_TOKEN:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.rate = settings.PROFILE_SAMPLE_RATE
+        self.token = settings.PROFILE_TOKEN
+        self.directory = settings.PROFILE_DIR
+        self.keep = settings.PROFILE_MAX_DUMPS
+        os.makedirs(self.directory, exist_ok=True)
+
+    def sampled(self, request: HttpRequest) -> bool:
+        if self.token:
+            header = request.META.get("HTTP_X_MULTIPOLL_PROFILE")
+            if header is not None and hmac.compare_digest(header, self.token):
+                return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not self.sampled(request):
+            return self.get_response(request)
+        profile = cProfile.Profile()
+        started = time.time()
+        profile.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profile.disable()
+        self.write(profile, request, response, started, time.time() - started)
+        return response
+
+    def write(self, profile: cProfile.Profile, request: HttpRequest, response: HttpResponse,
+              started: float, seconds: float) -> None:
+        tags = _request_tags(request)
+        tags.update(status=str(response.status_code), seconds=f"{seconds:.6f}",
+                    time=f"{started:.6f}")
+        name = _UNSAFE_FILENAME.sub("_", f"{started:.6f}-{os.getpid()}-{tags['view']}")
+        base = os.path.join(self.directory, name)
+        profile.dump_stats(base + DUMP_SUFFIX)
+        with open(base + TAGS_SUFFIX, "w") as f:
+            json.dump(tags, f)
+        _rotate(self.directory, self.keep)
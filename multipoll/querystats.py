@@ -0,0 +1,130 @@
+from __future__ import annotations  # noqa: T484
+
+import logging
+import os
+import time
+import traceback
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+
+from multipoll import logs
+
+logger = logging.getLogger(__name__)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+
+# Most queries each endpoint may run, for a first-time voter and whether or not the poll's
+# results are cached, however many voters and options it has. Counts that grow with the poll
+# are N+1s. Slack updates are coalesced onto another thread
+# and aren't part of the request. Checked by `manage.py checkquerybudgets`.
+QUERY_BUDGETS: Dict[str, int] = {
+    # rendering the empty poll for Slack, INSERT it, UPDATE ... RETURNING its version
+    "slash_poll": 3,
+    # the single upsert of write_weight, a cached tally is patched from what it returns
+    "interactive_button:bool_option": 1,
+    "interactive_button:int_vote": 1,
+    # poll, user get_or_create (4 for a new user) and the voter's weight for the dialog
+    "interactive_button:int_option": 6,
+    # only opens a dialog
+    "interactive_button:addMore": 0,
+    # the array_append UPDATE, and a SELECT if the option was already there
+    "interactive_button:newOption": 2,
+    # poll, user (2 for a new user), the voter's full and partial votes, then for a first-time
+    # voter checking for and saving an empty full vote, which bumps the version (1) and
+    # patches a cached tally with the voter's merged ballot (2). The form reuses the vote.
+    "vote_on_poll:GET": 10,
+    # see submit_vote, with a first-time voter and a cached tally
+    "vote_on_poll:POST": 10,
+    # the poll's revision, the poll, and the merged ballots for the tally
+    "poll_results": 3,
+}
+
+
+def caller_frame() -> Optional[str]:
+    # The innermost frame in this app outside this module, i.e. the code that ran the query
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(_PACKAGE_DIR) and filename != _THIS_FILE:
+            return f"{os.path.relpath(filename, os.path.dirname(_PACKAGE_DIR))}:" \
+                   f"{frame.lineno} in {frame.name}"
+    return None
+
+
+class QueryStats:
+    # A connection.execute_wrapper that counts and times queries, and logs slow ones
+    def __init__(self, slow_ms: Optional[float] = None, record: bool = False):
+        if slow_ms is None:
+            slow_ms = settings.SLOW_QUERY_MS
+        self.slow_seconds = slow_ms / 1000
+        self.record = record
+        self.count = 0
+        self.seconds = 0.0
+        self.queries: List[str] = []
+
+    def __call__(self, execute: Callable[..., Any], sql: str, params: Any, many: bool,
+                 context: Dict[str, Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if self.record:
+                self.queries.append(sql)
+            if elapsed >= self.slow_seconds > 0:
+                logs.log_event(logger, logging.WARNING, "slow_query", ms=elapsed * 1000,
+                               sql=sql, caller=caller_frame())
+
+
+@contextmanager
+def track_queries(slow_ms: Optional[float] = None, record: bool = False) -> Iterator[QueryStats]:
+    # Only sees queries on this thread's connection
+    stats = QueryStats(slow_ms, record)
+    with connection.execute_wrapper(stats):
+        yield stats
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_query_budget(endpoint: str, budget: Optional[int] = None) -> Iterator[QueryStats]:
+    if budget is None:
+        budget = QUERY_BUDGETS[endpoint]
+    with track_queries(record=True) as stats:
+        yield stats
+    if stats.count > budget:
+        listing = "\n".join(f"  {i}. {sql}" for i, sql in enumerate(stats.queries, 1))
+        raise QueryBudgetExceeded(f"{endpoint} ran {stats.count} queries, its budget is "
+                                  f"{budget}:\n{listing}")
+
+
+class QueryStatsMiddleware:
+    # Logs the number of queries and the time spent in the database for each request, and
+    # any single query slower than MPOLLS_SLOW_QUERY_MS with the line that ran it.
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        if not settings.QUERY_STATS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with track_queries() as stats:
+            response = self.get_response(request)
+        match = getattr(request, "resolver_match", None)
+        view = None
+        if match:
+            view = match.url_name or match.func.__name__
+        logs.log_event(logger, logging.DEBUG, "request_queries", view=view,
+                       path=request.path, queries=stats.count, db_ms=stats.seconds * 1000)
+        if settings.DEBUG:
+            response["Server-Timing"] = f'db;dur={stats.seconds * 1000:.1f};' \
+                                        f'desc="{stats.count} queries"'
+        return response
@@ -0,0 +1,88 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class TokenBucket:
+    # Tokens may go negative, a caller that takes one then waits until the debt is repaid.
+    # That keeps callers in arrival order without holding the lock while sleeping.
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self.lock:
+            now = self._refill()
+            self.tokens -= 1
+            return max(-self.tokens / self.rate, self.blocked_until - now, 0.0)
+
+    def try_reserve(self) -> float:
+        # Takes a token only if one is free now, otherwise returns how long to wait for it
+        with self.lock:
+            now = self._refill()
+            wait = max((1 - self.tokens) / self.rate, self.blocked_until - now)
+            if wait > 0:
+                return wait
+            self.tokens -= 1
+            return 0.0
+
+    def blocked_for(self) -> float:
+        # Only what a Retry-After still asks for, without taking a token
+        with self.lock:
+            return max(self.blocked_until - self.clock(), 0.0)
+
+    def block_for(self, seconds: float) -> None:
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, self.clock() + seconds)
+            self.tokens = min(self.tokens, 0.0)
+
+    def _refill(self) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+
+class RateLimitScheduler:
+    # One bucket per (method, channel). limits maps a method to (calls per second, burst).
+    def __init__(self, limits: Dict[str, Tuple[float, float]],
+                 default_limit: Tuple[float, float] = (1.0, 1.0),
+                 sleep: Callable[[float], None] = time.sleep):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.sleep = sleep
+        self.buckets: Dict[Hashable, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, method: str, channel: Hashable = None) -> TokenBucket:
+        key = (method, channel)
+        with self.lock:
+            if key not in self.buckets:
+                rate, capacity = self.limits.get(method, self.default_limit)
+                self.buckets[key] = TokenBucket(rate, capacity)
+            return self.buckets[key]
+
+    def reserve(self, method: str, channel: Hashable = None) -> float:
+        # Takes a token and returns how long to sleep before using it
+        return self.bucket(method, channel).reserve()
+
+    def wait(self, method: str, channel: Hashable = None) -> float:
+        delay = self.reserve(method, channel)
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+    def try_acquire(self, method: str, channel: Hashable = None) -> float:
+        # For callers that can't sleep, 0 means go ahead
+        return self.bucket(method, channel).try_reserve()
+
+    def blocked_for(self, method: str, channel: Hashable = None) -> float:
+        return self.bucket(method, channel).blocked_for()
+
+    def retry_after(self, method: str, channel: Hashable, seconds: float) -> None:
+        self.bucket(method, channel).block_for(seconds)
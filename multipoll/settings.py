@@ -37,8 +37,6 @@ INSTALLED_APPS = (
     'django_extensions',
 )
 
-MIDDLEWARE = ()
-
 ROOT_URLCONF = 'multipoll.urls'
 
 TEMPLATES = [
@@ -55,22 +53,45 @@ TEMPLATES = [
     },
 ]
 
+# MPOLLS_LOG_FORMAT=text logs multipoll's messages without the JSON fields
+MULTIPOLL_LOG_HANDLER = {'class': 'logging.StreamHandler'}
+if os.getenv('MPOLLS_LOG_FORMAT', 'json') == 'json':
+    MULTIPOLL_LOG_HANDLER['formatter'] = 'json'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'formatters': {
+        'json': {
+            '()': 'multipoll.logs.JsonFormatter',
+        },
+    },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
         },
+        'multipoll': MULTIPOLL_LOG_HANDLER,
     },
     'loggers': {
         'django': {
             'handlers': ['console'],
             'level': os.getenv('DJANGO_LOG_LEVEL', 'INFO'),
         },
+        'multipoll': {
+            'handlers': ['multipoll'],
+            'level': os.getenv('MPOLLS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
 }
 
+# Fraction of requests to each endpoint whose payload is logged, e.g.
+# MPOLLS_LOG_SAMPLE_RATES="interactive_button=0.05;slash_poll=1". Unlisted endpoints log all.
+LOG_SAMPLE_RATES = {endpoint.strip(): float(rate) for endpoint, _, rate in
+                    (item.partition('=') for item in
+                     os.getenv('MPOLLS_LOG_SAMPLE_RATES', 'interactive_button=0.1').split(';'))
+                    if endpoint.strip()}
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/1.8/topics/i18n/
@@ -86,11 +107,67 @@ USE_L10N = True
 USE_TZ = True
 
 MIDDLEWARE = (
+    'multipoll.metrics.MetricsMiddleware',
+    'multipoll.querystats.QueryStatsMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'multipoll.profiling.ProfilingMiddleware',
 )
 
+# Directory shared by all workers for /metrics, must be emptied when the server (re)starts.
+# prometheus_client picks it up from the environment when first imported.
+METRICS_DIR = os.environ.get("MPOLLS_METRICS_DIR", None)
+if METRICS_DIR:
+    os.environ.setdefault("prometheus_multiproc_dir", METRICS_DIR)
+# Bearer token /metrics requires, without it /metrics is only served with DEBUG on
+METRICS_TOKEN = os.environ.get("MPOLLS_METRICS_TOKEN", "")
+
+# Count queries and database time per request, logged as DEBUG request_queries events, and
+# log any query slower than MPOLLS_SLOW_QUERY_MS (0 disables) with the line that ran it
+QUERY_STATS = os.environ.get("MPOLLS_QUERY_STATS", "1") == "1"
+SLOW_QUERY_MS = float(os.environ.get("MPOLLS_SLOW_QUERY_MS", "200"))
+
+# cProfile a fraction of requests, plus any request whose X-Multipoll-Profile header equals
+# MPOLLS_PROFILE_TOKEN. `manage.py profilereport` summarizes the dumps.
+PROFILE_SAMPLE_RATE = float(os.environ.get("MPOLLS_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.environ.get("MPOLLS_PROFILE_TOKEN", "")
+PROFILE_DIR = os.environ.get("MPOLLS_PROFILE_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILE_MAX_DUMPS = int(os.environ.get("MPOLLS_PROFILE_MAX_DUMPS", "200"))
+
 DATABASES = {}
 
+# Computed results are cached per poll version, see multipoll.models.resultscache. Point the
+# results cache at a file based or shared backend to share it between workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'results': {
+        'BACKEND': os.environ.get("MPOLLS_RESULTS_CACHE_BACKEND",
+                                  'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get("MPOLLS_RESULTS_CACHE_LOCATION", "multipoll-results"),
+        'TIMEOUT': int(os.environ.get("MPOLLS_RESULTS_CACHE_TIMEOUT", "3600")),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get("MPOLLS_RESULTS_CACHE_ENTRIES", "1000")),
+        },
+    },
+}
+RESULTS_CACHE = 'results'
+
+# Seconds to wait so a burst of votes on one poll is sent to Slack as a single chat.update
+SLACK_UPDATE_DELAY = float(os.environ.get("MPOLLS_SLACK_UPDATE_DELAY", "1.0"))
+
+# Queue dialogs and message updates for `manage.py slackworker` instead of calling Slack inline
+SLACK_USE_OUTBOX = os.environ.get("MPOLLS_SLACK_OUTBOX", "1") == "1"
+
+# Keep-alive connection pool and retry behaviour for calls to the Slack API. Point the URL at
+# `manage.py slacksimulator` to exercise everything without touching the real Slack.
+SLACK_API_URL = os.environ.get("MPOLLS_SLACK_API_URL", "https://slack.com/api/")
+SLACK_POOL_SIZE = int(os.environ.get("MPOLLS_SLACK_POOL_SIZE", "10"))
+SLACK_CONNECT_TIMEOUT = float(os.environ.get("MPOLLS_SLACK_CONNECT_TIMEOUT", "3.05"))
+SLACK_READ_TIMEOUT = float(os.environ.get("MPOLLS_SLACK_READ_TIMEOUT", "10"))
+SLACK_MAX_RETRIES = int(os.environ.get("MPOLLS_SLACK_MAX_RETRIES", "3"))
+SLACK_MAX_BACKOFF = float(os.environ.get("MPOLLS_SLACK_MAX_BACKOFF", "30"))
+
 # Honor the 'X-Forwarded-Proto' header for request.is_secure()
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 
@@ -1,18 +1,56 @@
-import datetime
+import functools
 import logging
 import os
-from typing import Dict, List, Optional, Union
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Union
 from typing import cast
 
+from django.conf import settings
 from django.core.exceptions import PermissionDenied
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from urllib3.exceptions import ConnectTimeoutError
+
+from multipoll import logs, metrics
+from multipoll.ratelimit import RateLimitScheduler
 
 logger = logging.getLogger(__name__)
 
+# Outbox lanes, lower is sent first. Dialogs go first since their trigger_id expires quickly.
+PRIORITY_DIALOG = 0
+PRIORITY_MESSAGE = 1
+
+# Calls per second and burst size, roughly Slack's published tiers for each method
+RATE_LIMITS = {
+    "chat.postMessage": (1.0, 3.0),
+    "chat.update": (50 / 60, 5.0),
+}
+# Only held back by a 429's Retry-After. A dialog answers one click within its trigger_id's 3s
+# and has no channel to share a bucket by, so one bucket would queue the whole workspace.
+UNTHROTTLED_METHODS = frozenset(("dialog.open",))
+
+# Methods Slack applies at most once however often they are sent. Others, chat.postMessage
+# above all, are only retried when Slack can't have seen them: a failed connect or a 429.
+IDEMPOTENT_METHODS = frozenset(("chat.update", "dialog.open"))
+
 _client_secret = os.environ.get('MPOLLS_SLACK_SECRET', '')
 _bot_secret = os.environ.get('MPOLLS_SLACK_BOT_SECRET', '')
 
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_scheduler = RateLimitScheduler(RATE_LIMITS)
+_stats: Counter = Counter()
+_stats_lock = threading.Lock()
+
+
+class SlackRateLimited(requests.HTTPError):
+    pass
+
 
 def _get_token(use_client_secret: bool = True) -> str:
     if use_client_secret:
@@ -23,20 +61,153 @@ def _get_token(use_client_secret: bool = True) -> str:
     if secret:
         return secret
     else:
-        logging.error(f"No secret is available with use_client_secret: {use_client_secret}")
+        logger.error("No secret is available with use_client_secret: %s", use_client_secret)
         raise PermissionDenied()
 
 
+@contextmanager
+def using_tokens(client_secret: str, bot_secret: str) -> Iterator[None]:
+    # Swaps the API tokens for the duration, e.g. for a stand-in like multipoll.slacksimulator
+    global _client_secret, _bot_secret
+    previous = _client_secret, _bot_secret
+    _client_secret, _bot_secret = client_secret, bot_secret
+    _create_headers.cache_clear()
+    try:
+        yield
+    finally:
+        _client_secret, _bot_secret = previous
+        _create_headers.cache_clear()
+
+
+@functools.lru_cache(maxsize=2)
 def _create_headers(use_client_secret: bool = True) -> Dict[str, str]:
     # Set the Content-Type so we can be sure charset gets set
     return {"Authorization": f"Bearer {_get_token(use_client_secret)}",
             "Content-Type": "application/json; charset=utf-8"}
 
 
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.SLACK_POOL_SIZE,
+                                      pool_block=True)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _count(stat: str) -> None:
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def connection_stats() -> Dict[str, int]:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["new_connections"] = 0
+    stats["pooled_requests"] = 0
+    if _session is not None:
+        pools = _session.get_adapter(settings.SLACK_API_URL).poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            stats["new_connections"] += pool.num_connections
+            stats["pooled_requests"] += pool.num_requests - pool.num_connections
+    return stats
+
+
+def _backoff(attempt: int) -> float:
+    return min(settings.SLACK_MAX_BACKOFF, 0.5 * 2 ** attempt)
+
+
+def _never_sent(error: requests.RequestException) -> bool:
+    # A connect timeout, or a ConnectionError wrapping urllib3's NewConnectionError. Other
+    # ConnectionErrors, like a dropped connection, can come after Slack got the request.
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not error.args:
+        return False
+    return isinstance(getattr(error.args[0], "reason", None), ConnectTimeoutError)
+
+
+def _throttle(method: str, channel: Optional[str], fail_fast: bool) -> None:
+    if method in UNTHROTTLED_METHODS:
+        wait = _scheduler.blocked_for(method, channel)
+    elif fail_fast:
+        wait = _scheduler.try_acquire(method, channel)
+    else:
+        wait = _scheduler.reserve(method, channel)
+    if wait > 0:
+        _count("throttled")
+        if fail_fast:
+            raise SlackRateLimited(f"{method} is rate limited for another {wait:.1f}s")
+        time.sleep(wait)
+
+
+def call_method(method: str, body: Dict[str, Any], use_client_secret: bool = True,
+                fail_fast: bool = False) -> requests.Response:
+    # fail_fast is for calls made while Slack waits on our own response, they raise
+    # SlackRateLimited rather than sleep for the rate limit and are never retried
+    channel = body.get("channel", None)
+    max_retries = settings.SLACK_MAX_RETRIES
+    if fail_fast:
+        max_retries = 0
+    idempotent = method in IDEMPOTENT_METHODS
+    for attempt in range(max_retries + 1):
+        _throttle(method, channel, fail_fast)
+        _count("calls")
+        started = time.perf_counter()
+        try:
+            response = _get_session().post(f"{settings.SLACK_API_URL}{method}", json=body,
+                                           headers=_create_headers(use_client_secret),
+                                           timeout=(settings.SLACK_CONNECT_TIMEOUT,
+                                                    settings.SLACK_READ_TIMEOUT))
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.observe_slack_call(method, "error", time.perf_counter() - started)
+            _count("errors")
+            if attempt == max_retries or not (idempotent or _never_sent(e)):
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+        metrics.observe_slack_call(method, str(response.status_code),
+                                   time.perf_counter() - started)
+        level = logging.DEBUG
+        if not response.ok:
+            level = logging.WARNING
+        logs.log_event(logger, level, "slack_response", method=method,
+                       status=response.status_code, body=response.content)
+        if response.status_code == 429:
+            _count("rate_limited")
+            retry_after = float(response.headers.get("Retry-After", _backoff(attempt)))
+            _scheduler.retry_after(method, channel, retry_after)
+            if attempt == max_retries:
+                raise SlackRateLimited(f"{method} was rate limited for {retry_after}s",
+                                       response=response)
+        elif response.status_code >= 500 and idempotent and attempt < max_retries:
+            _count("errors")
+            time.sleep(_backoff(attempt))
+        else:
+            response.raise_for_status()
+            return response
+    raise AssertionError("unreachable")
+
+
+def _dispatch(method: str, body: Dict[str, Any], priority: int, use_client_secret: bool,
+              supersede_key: Optional[str] = None, fail_fast: bool = False) -> None:
+    # fail_fast only matters without the outbox, when the call is made right here
+    if settings.SLACK_USE_OUTBOX:
+        from multipoll.models import SlackOutboxMessage
+        SlackOutboxMessage.enqueue(method, body, priority, use_client_secret, supersede_key)
+    else:
+        call_method(method, body, use_client_secret, fail_fast=fail_fast)
+
+
 def create_dialog(trigger_id: str, title: str, state: str, callback_id: str,
                   elements: List[Dict[str, Union[str, bool]]],
                   use_client_secret: bool = True) -> None:
-    method_url = 'https://slack.com/api/dialog.open'
     method_params = {
         "trigger_id": trigger_id,
         "dialog": {
@@ -46,35 +217,34 @@ def create_dialog(trigger_id: str, title: str, state: str, callback_id: str,
             "elements": elements
         }
     }
-    logger.info(f"Dialog Params at {datetime.datetime.utcnow().timestamp():.6f}: {method_params}")
-    response_data = requests.post(method_url, json=method_params,
-                                  headers=_create_headers(use_client_secret))
-    logger.info(f"Dialog Response Status({response_data.status_code}) at "
-                + f"{datetime.datetime.utcnow().timestamp():.6f} Body: {response_data.content}")
-    response_data.raise_for_status()
+    logs.log_event(logger, logging.DEBUG, "slack_dialog", params=method_params)
+    # Opened from the interactive webhook, the trigger_id is gone before a retry could help
+    try:
+        _dispatch("dialog.open", method_params, PRIORITY_DIALOG, use_client_secret,
+                  fail_fast=True)
+    except SlackRateLimited as e:
+        logger.warning("Dropped a dialog, Slack is rate limiting dialog.open: %s", e)
 
 
 def post_message(channel: str, message: str, attachments: Optional[str] = None,
                  use_client_secret: bool = True) -> str:
-    post_message_url = "https://slack.com/api/chat.postMessage"
+    # Sent inline since the returned ts is the new poll's primary key. That is always while
+    # handling a request, so this fails fast instead of waiting out a rate limit.
     body_dict = {
         "text": message,
         "channel": channel,
         "icon_url": "https://simplepoll.rocks/static/main/simplepolllogo-colors.png",
         "attachments": attachments
     }
-    logger.debug(f'Post Params: {body_dict}')
-    text_response = requests.post(post_message_url, headers=_create_headers(use_client_secret),
-                                  json=body_dict)
-    logger.info('Post Response Body: %s', text_response.content)
-    text_response.raise_for_status()
+    logs.log_event(logger, logging.DEBUG, "slack_post", params=body_dict)
+    text_response = call_method("chat.postMessage", body_dict, use_client_secret,
+                                fail_fast=True)
     text_response_dict = text_response.json()
     return cast(str, text_response_dict['ts'])
 
 
 def update_message(channel: str, timestamp: str, text: str, attachments: Optional[str] = None,
                    use_client_secret: bool = True) -> None:
-    method_url = 'https://slack.com/api/chat.update'
     body_dict = {
         "channel": channel,
         "ts": timestamp,
@@ -82,8 +252,6 @@ def update_message(channel: str, timestamp: str, text: str, attachments: Optiona
         "attachments": attachments,
         "parse": "full"
     }
-    logger.info(f"Update Params: {body_dict}")
-    text_response = requests.post(method_url, headers=_create_headers(use_client_secret),
-                                  json=body_dict)
-    logger.info("Update Response Body: %s", text_response.content)
-    text_response.raise_for_status()
+    logs.log_event(logger, logging.DEBUG, "slack_update", params=body_dict)
+    _dispatch("chat.update", body_dict, PRIORITY_MESSAGE, use_client_secret,
+              f"chat.update:{channel}:{timestamp}")
@@ -0,0 +1,184 @@
+from __future__ import annotations  # noqa: T484
+
+import json
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from django.test import override_settings
+
+from multipoll import slack
+
+# A local stand-in for the parts of the Slack Web API multipoll calls. Point
+# settings.SLACK_API_URL at SlackSimulator.url to use it, or run it with serving().
+
+
+@dataclass
+class SimulatedCall:
+    method: str
+    body: Dict[str, Any]
+    status: int
+    received: float
+    duration: float
+
+
+class SlackSimulator:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 jitter: float = 0.0, rate_limit_probability: float = 0.0,
+                 retry_after: int = 1, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.calls: List[SimulatedCall] = []
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.last_ts = 0.0
+        self.server = _SimulatorServer((host, port), self)
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    def start(self) -> SlackSimulator:
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self) -> SlackSimulator:
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    @contextmanager
+    def serving(self, **overrides: Any) -> Iterator[SlackSimulator]:
+        # Runs the simulator with this process' Slack calls sent to it, overrides are more
+        # settings to change meanwhile. The simulator accepts any bearer token.
+        with self, override_settings(SLACK_API_URL=self.url, **overrides):
+            with slack.using_tokens("xoxp-simulator", "xoxb-simulator"):
+                yield self
+
+    def reset(self) -> None:
+        with self.lock:
+            self.calls = []
+
+    def counts(self) -> Dict[Tuple[str, int], int]:
+        with self.lock:
+            return dict(Counter((call.method, call.status) for call in self.calls))
+
+    def summary(self) -> Dict[str, Any]:
+        return {"calls": len(self.calls),
+                "by_method": {f"{method} {status}": count
+                              for (method, status), count in sorted(self.counts().items())}}
+
+    def delay(self) -> float:
+        with self.lock:
+            return self.latency + self.random.uniform(0, self.jitter)
+
+    def _should_rate_limit(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.rate_limit_probability
+
+    def _next_ts(self) -> str:
+        # Slack message timestamps are unique per channel, ours are unique per simulator
+        with self.lock:
+            self.last_ts = max(time.time(), self.last_ts + 0.000001)
+            return f"{self.last_ts:.6f}"
+
+    def record(self, call: SimulatedCall) -> None:
+        with self.lock:
+            self.calls.append(call)
+
+    def respond(self, method: str, body: Dict[str, Any],
+                authorized: bool) -> Tuple[int, Dict[str, str], Dict[str, Any]]:
+        if self._should_rate_limit():
+            return 429, {"Retry-After": str(self.retry_after)}, \
+                {"ok": False, "error": "ratelimited"}
+        if not authorized:
+            return 200, {}, {"ok": False, "error": "not_authed"}
+        if method == "chat.postMessage":
+            ts = self._next_ts()
+            return 200, {}, {"ok": True, "channel": body.get("channel"), "ts": ts,
+                             "message": {"text": body.get("text"), "ts": ts}}
+        elif method == "chat.update":
+            return 200, {}, {"ok": True, "channel": body.get("channel"), "ts": body.get("ts"),
+                             "text": body.get("text")}
+        elif method == "dialog.open":
+            if not body.get("trigger_id"):
+                return 200, {}, {"ok": False, "error": "invalid_trigger"}
+            return 200, {}, {"ok": True}
+        else:
+            return 200, {}, {"ok": False, "error": "unknown_method"}
+
+
+class _SimulatorHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: _SimulatorServer
+
+    def _send_json(self, status: int, headers: Dict[str, str], content: Dict[str, Any]) -> None:
+        data = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        # The body is read even for unknown paths, so the kept-alive connection stays usable
+        length = int(self.headers.get("Content-Length", 0))
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def do_GET(self) -> None:  # noqa: N802
+        if self.path.rstrip("/") == "/calls":
+            self._send_json(200, {}, self.server.simulator.summary())
+        else:
+            self._send_json(404, {}, {"ok": False, "error": "not_found"})
+
+    def do_POST(self) -> None:  # noqa: N802
+        received = time.monotonic()
+        body = self._read_json()
+        if not self.path.startswith("/api/"):
+            self._send_json(404, {}, {"ok": False, "error": "not_found"})
+            return
+        method = self.path[len("/api/"):]
+        simulator = self.server.simulator
+        delay = simulator.delay()
+        if delay > 0:
+            time.sleep(delay)
+        authorized = self.headers.get("Authorization", "").startswith("Bearer ")
+        status, headers, content = simulator.respond(method, body, authorized)
+        self._send_json(status, headers, content)
+        simulator.record(SimulatedCall(method, body, status, received,
+                                       time.monotonic() - received))
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+
+class _SimulatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], simulator: SlackSimulator):
+        super().__init__(address, _SimulatorHandler)
+        self.simulator = simulator
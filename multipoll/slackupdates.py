@@ -0,0 +1,96 @@
+import datetime
+import logging
+import threading
+import zlib
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# High half of the advisory lock key, so our locks can't collide with other users of the db
+_LOCK_NAMESPACE = 0x6d706f6c
+
+# Seconds before trying again when another worker holds a poll's lease
+LOCKED_RETRY_DELAY = 0.2
+
+_pending: Dict[str, threading.Timer] = {}
+_pending_lock = threading.Lock()
+
+
+def _lock_key(timestamp: str) -> int:
+    return (_LOCK_NAMESPACE << 32) | zlib.crc32(timestamp.encode())
+
+
+def schedule_update(timestamp: str, delay: Optional[float] = None) -> None:
+    if delay is None:
+        delay = settings.SLACK_UPDATE_DELAY
+    if delay <= 0:
+        if not flush_update(timestamp):
+            # The worker holding the lease may have rendered the poll before this change
+            logger.debug("Update for %s is being sent by another worker, retrying", timestamp)
+            schedule_update(timestamp, LOCKED_RETRY_DELAY)
+        return
+    with _pending_lock:
+        if timestamp in _pending:
+            return
+        timer = threading.Timer(delay, _run_scheduled, args=(timestamp,))
+        timer.daemon = True
+        _pending[timestamp] = timer
+    timer.start()
+
+
+def _run_scheduled(timestamp: str) -> None:
+    with _pending_lock:
+        _pending.pop(timestamp, None)
+    try:
+        if not flush_update(timestamp):
+            logger.debug("Update for %s is being sent by another worker, retrying", timestamp)
+            schedule_update(timestamp)
+    except Exception:  # noqa: B902
+        logger.exception("Failed to send the coalesced update for %s", timestamp)
+    finally:
+        connection.close()
+
+
+def flush_update(timestamp: str) -> bool:
+    # Returns False without doing anything if another worker holds the lease for this poll.
+    # Whoever holds it renders the poll as it is now, so any number of queued changes are
+    # covered by a single chat.update and a stale render is never sent after a newer one.
+    from multipoll.models import PollBase
+    key = _lock_key(timestamp)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        if not cursor.fetchone()[0]:
+            return False
+    try:
+        poll = PollBase.objects.get(pk=timestamp)
+        if poll.version > poll.slack_version:
+            poll.send_update()
+            PollBase.objects.filter(pk=poll.pk, slack_version__lt=poll.version) \
+                .update(slack_version=poll.version)
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+    return True
+
+
+def sweep_updates(limit: int = 100) -> int:
+    # A pending update only lives in its process' timer, so one that exits or fails before
+    # the timer fires leaves slack_version behind version. Polls changed within the last
+    # SLACK_UPDATE_DELAY are left to the timer that may still be coalescing them.
+    from multipoll.models import PollBase
+    from multipoll.models.fields import TimestampField
+    cutoff = timezone.now() - datetime.timedelta(seconds=max(settings.SLACK_UPDATE_DELAY, 0))
+    stale = list(PollBase.objects.filter(slack_version__lt=F('version'), modified__lt=cutoff)
+                 .order_by('modified').values_list('timestamp', flat=True)[:limit])
+    flushed = 0
+    for timestamp in stale:
+        try:
+            flushed += flush_update(str(TimestampField.normalize_to_timestamp(timestamp)))
+        except Exception:  # noqa: B902
+            logger.exception("Failed to send the missed update for %s", timestamp)
+    return flushed
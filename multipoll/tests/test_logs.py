@@ -0,0 +1,42 @@
+import json
+
+from django.http import QueryDict
+from django.test import SimpleTestCase
+
+from multipoll import logs
+
+
+class RedactTests(SimpleTestCase):
+    def slack_fields(self) -> dict:
+        # As views log an interactive message: its form, with the payload as a JSON string
+        payload = {"token": "verifier", "callback_id": "options",
+                   "actions": [{"name": "vote", "type": "select",
+                                "selected_options": [{"value": "3"}]}]}
+        form = QueryDict(mutable=True)
+        form["payload"] = json.dumps(payload)
+        return {"endpoint": "interactive_button", "payload": form}
+
+    def test_slack_selected_options_are_kept(self) -> None:
+        redacted = logs.redact(self.slack_fields())
+        action = redacted["payload"]["payload"]["actions"][0]
+        self.assertEqual(action["selected_options"], [{"value": "3"}])
+
+    def test_secrets_are_redacted_at_any_depth(self) -> None:
+        redacted = logs.redact(self.slack_fields())
+        self.assertEqual(redacted["payload"]["payload"]["token"], logs.REDACTED)
+        self.assertEqual(logs.redact({"a": [{"User_Secret": "x"}]}),
+                         {"a": [{"User_Secret": logs.REDACTED}]})
+
+    def test_depth_is_limited(self) -> None:
+        nested: dict = {"leaf": 1}
+        for _ in range(logs.MAX_DEPTH):
+            nested = {"next": nested}
+        redacted = logs.redact(nested)
+        for _ in range(logs.MAX_DEPTH - 1):
+            redacted = redacted["next"]
+        self.assertEqual(redacted["next"], "{...1 keys}")
+
+    def test_long_values_and_collections_are_truncated(self) -> None:
+        redacted = logs.redact({"text": "x" * 300, "items": list(range(30))})
+        self.assertTrue(redacted["text"].endswith("...(100 more chars)"))
+        self.assertEqual(len(redacted["items"]), logs.MAX_ITEMS + 1)
@@ -0,0 +1,23 @@
+from django.test import RequestFactory, SimpleTestCase
+from django.test import override_settings
+
+from multipoll.metrics import metrics_view
+
+
+class MetricsAccessTests(SimpleTestCase):
+    def get(self, **headers: str) -> int:
+        return metrics_view(RequestFactory().get("/metrics", **headers)).status_code
+
+    @override_settings(METRICS_TOKEN="", DEBUG=False)
+    def test_hidden_without_token(self) -> None:
+        self.assertEqual(self.get(), 404)
+
+    @override_settings(METRICS_TOKEN="", DEBUG=True)
+    def test_served_in_debug_without_token(self) -> None:
+        self.assertEqual(self.get(), 200)
+
+    @override_settings(METRICS_TOKEN="scrape", DEBUG=True)
+    def test_token_required_when_set(self) -> None:
+        self.assertEqual(self.get(), 404)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer wrong"), 404)
+        self.assertEqual(self.get(HTTP_AUTHORIZATION="Bearer scrape"), 200)
@@ -0,0 +1,67 @@
+import json
+from typing import Any, List, Optional
+
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from multipoll.views import compile_query_spec, query_dict_to_kwonlyargs
+
+
+@query_dict_to_kwonlyargs
+def echo(request: HttpRequest, *, system: Optional[str] = None,
+         systems_list: Optional[List[str]] = None, count: Optional[int] = None,
+         ratio_list: Optional[List[float]] = None, flag: bool = False) -> HttpResponse:
+    return JsonResponse({"system": system, "systems_list": systems_list, "count": count,
+                         "ratio_list": ratio_list, "flag": flag})
+
+
+@query_dict_to_kwonlyargs
+def echo_any(request: HttpRequest, *, count: int = 0, **kwargs: Any) -> HttpResponse:
+    return JsonResponse({"count": count, **kwargs})
+
+
+class QueryArgumentTests(SimpleTestCase):
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+
+    def call(self, handler: Any, query: str) -> Any:
+        response = handler(self.factory.get("/?" + query))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_list_suffix_binds_every_value(self) -> None:
+        result = self.call(echo, "systems=borda&systems=approval&system=irv")
+        self.assertEqual(result["systems_list"], ["borda", "approval"])
+        self.assertEqual(result["system"], "irv")
+
+    def test_list_values_are_converted(self) -> None:
+        result = self.call(echo, "ratio=0.5&ratio=2")
+        self.assertEqual(result["ratio_list"], [0.5, 2.0])
+
+    def test_single_values_are_converted(self) -> None:
+        result = self.call(echo, "count=3&flag=true")
+        self.assertEqual(result["count"], 3)
+        self.assertIs(result["flag"], True)
+
+    def test_missing_keys_keep_defaults(self) -> None:
+        self.assertEqual(self.call(echo, "unrelated=1"),
+                         {"system": None, "systems_list": None, "count": None,
+                          "ratio_list": None, "flag": False})
+
+    def test_invalid_value_is_bad_request(self) -> None:
+        response = echo(self.factory.get("/?ratio=1&ratio=lots"))
+        self.assertEqual(response.status_code, 400)
+
+    def test_kwargs_get_unbound_keys(self) -> None:
+        self.assertEqual(self.call(echo_any, "count=2&other=x"), {"count": 2, "other": "x"})
+
+    def test_post_data_is_bound(self) -> None:
+        response = echo(self.factory.post("/", {"systems": ["borda", "irv"]}))
+        self.assertEqual(json.loads(response.content)["systems_list"], ["borda", "irv"])
+
+    def test_spec_strips_list_suffix(self) -> None:
+        spec = compile_query_spec(echo.__wrapped__)
+        keys = {argument.name: (argument.key, argument.many) for argument in spec.arguments}
+        self.assertEqual(keys["systems_list"], ("systems", True))
+        self.assertEqual(keys["system"], ("system", False))
+        self.assertFalse(spec.accepts_any)
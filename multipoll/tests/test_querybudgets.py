@@ -0,0 +1,33 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase
+
+from multipoll.querystats import QUERY_BUDGETS
+
+
+class QueryBudgetTests(TransactionTestCase):
+    # Runs the checkquerybudgets command, with enough voters that an N+1 over them or the
+    # options would blow every budget. A TransactionTestCase, so the on_commit hooks that
+    # update cached tallies run as they do in production.
+    def test_endpoints_stay_within_budget(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "budgets.json")
+            try:
+                call_command("checkquerybudgets", voters=60, options=8, seed=1, json=path,
+                             stdout=io.StringIO())
+            except CommandError:
+                pass  # the failing checks are reported one by one below
+            with open(path) as f:
+                results = json.load(f)
+        self.assertEqual({r["endpoint"] for r in results}, set(QUERY_BUDGETS))
+        for result in results:
+            with self.subTest(poll=result["poll"], check=result["label"],
+                              cached=result["cached"]):
+                self.assertLess(result["status"], 400)
+                self.assertLessEqual(result["queries"], result["budget"],
+                                     "\n".join(result["sql"]))
@@ -17,14 +17,17 @@ Examples:
 """
 from django.conf.urls import url
 
-from multipoll import views
+from multipoll import metrics, views
 
 urlpatterns = [
     url(r'^status', views.server_status, name="status"),
+    url(r'^metrics', metrics.metrics_view, name="metrics"),
     url(r'^slack/interactive', views.interactive_button, name="interactive_button"),
     url(r'^slack/slash', views.slash_poll, name="poll"),
     url(r'^polls/(?P<poll_timestamp>\d+(\.\d+)?)/results/visualize',
         views.poll_results_visualization),
+    url(r'^polls/(?P<poll_timestamp>\d+(\.\d+)?)/results/compare',
+        views.poll_results_comparison),
     url(r'^polls/(?P<poll_timestamp>\d+(\.\d+)?)/results', views.poll_results),
     url(r'^polls/(?P<poll_timestamp>\d+(\.\d+)?)/vote', views.vote_on_poll),
     url(r'^polls/(?P<poll_timestamp>\d+(\.\d+)?)/', views.view_poll),
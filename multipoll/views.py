@@ -1,23 +1,35 @@
 import datetime
+import functools
+import hashlib
 import inspect
 import json
 import logging
 import os
-from typing import Any, Callable, Dict, List, Optional, Union
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple, Union
+from typing import cast, get_type_hints
 
 from django.core import serializers
-from django.core.exceptions import SuspiciousOperation
+from django.core.exceptions import SuspiciousOperation, ValidationError
 from django.db import models
 from django.http import HttpRequest, HttpResponse, HttpResponseBadRequest, HttpResponseNotFound
+from django.http import QueryDict
 from django.shortcuts import redirect, render
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 
-from multipoll import slack, utils
+from multipoll import logs, slack, utils
 from multipoll.forms import FullApprovalVoteForm, FullMultiVoteForm, NameAndSecretForm
-from multipoll.models import ApprovalPoll, MultiPoll, PollBase, User
+from multipoll.models import ApprovalPoll, MultiPoll, PartialApprovalVote, PartialMultiVote
+from multipoll.models import PollBase, User
+from multipoll.models import submit_vote
+from multipoll.models.fields import TimestampField
 
 logger = logging.getLogger(__name__)
 
+OPTION_MAX_LENGTH = 100
+
 
 def check_token(request: HttpRequest) -> Optional[HttpResponse]:
     verifier = os.environ.get("MPOLLS_SLACK_VERIFIER", "")
@@ -34,11 +46,10 @@ def check_token(request: HttpRequest) -> Optional[HttpResponse]:
     return None
 
 
-def normalize_post(request: HttpRequest) -> None:
+def normalize_post(request: HttpRequest, endpoint: str) -> None:
     if getattr(request, "POST") is None:
         request.POST = json.loads(request.body)
-    logger.info(f'Request to {inspect.stack()[1].function} at '
-                + f'{datetime.datetime.utcnow().timestamp():.6f}: {request.POST}')
+    logs.log_request(logger, endpoint, request.POST)
 
 
 @csrf_exempt
@@ -46,9 +57,19 @@ def server_status(request: HttpRequest) -> HttpResponse:
     return HttpResponse()
 
 
+def add_dialog_option(payload: Dict[str, Any]) -> None:
+    # The "Add an Option" dialog was submitted, its state is the poll's timestamp
+    option = payload['submission']['new_option'].strip()
+    if option:
+        try:
+            PollBase.append_option(payload['state'], option[:OPTION_MAX_LENGTH])
+        except ValueError as e:
+            logger.warning("Could not add option to %s: %s", payload['state'], e)
+
+
 @csrf_exempt
 def interactive_button(request: HttpRequest) -> HttpResponse:
-    normalize_post(request)
+    normalize_post(request, "interactive_button")
 
     error_code = check_token(request)
     if error_code is not None:
@@ -56,17 +77,14 @@ def interactive_button(request: HttpRequest) -> HttpResponse:
     divider = "_"
     payload = json.loads(request.POST['payload'])
     if payload["callback_id"] == "newOption":
-        poll = PollBase.timestamped(payload['state'])
-        poll.options.append(payload['submission']['new_option'])
-        poll.options = utils.unique_list(poll.options)
-        poll.save()
+        add_dialog_option(payload)
     elif payload['callback_id'] == 'int_vote':
         ts, ind_str = payload['state'].split(divider)
-        poll = PollBase.timestamped(ts)
-        user = User.find_or_create("@" + payload['user']["name"])
-        vote = poll.PartialVoteType.find_or_create(poll=poll, user=user, option=int(ind_str))
-        vote.weight = payload['submission']['weight']
-        vote.save()
+        weight = payload['submission']['weight']
+        if weight == "":
+            weight = None
+        PartialMultiVote.write_weight(ts, "@" + payload['user']["name"], int(ind_str),
+                                      weight=weight)
     elif payload['callback_id'] == "options":
         event = payload["actions"][0]
         if event["name"] == "addMore":
@@ -78,14 +96,9 @@ def interactive_button(request: HttpRequest) -> HttpResponse:
             slack.create_dialog(payload['trigger_id'], "Add an Option",
                                 payload['original_message']['ts'], "newOption", elements)
         elif event["name"] == "bool_option":
-            poll = PollBase.timestamped(payload['original_message']['ts'])
-            voted_index = int(event['value'])
-            user = User.find_or_create('@' + payload['user']["name"])
-            vote = poll.PartialVoteType.find_or_create(poll=poll, option=voted_index, user=user)
-            if vote.weight is None:
-                vote.weight = False
-            vote.weight = not vote.weight
-            vote.save()
+            PartialApprovalVote.write_weight(payload['original_message']['ts'],
+                                             '@' + payload['user']["name"], int(event['value']),
+                                             toggle=True)
         elif event['name'] == "int_option":
             poll = PollBase.timestamped(payload['original_message']['ts'])
             ind = int(event['value'])
@@ -109,7 +122,7 @@ def interactive_button(request: HttpRequest) -> HttpResponse:
 
 @csrf_exempt
 def slash_poll(request: HttpRequest) -> HttpResponse:
-    normalize_post(request)
+    normalize_post(request, "slash_poll")
 
     error_code = check_token(request)
     if error_code is not None:
@@ -137,7 +150,12 @@ def slash_poll(request: HttpRequest) -> HttpResponse:
         cls = MultiPoll
     else:
         return HttpResponseBadRequest()
-    cls.add(channel, question, options)
+    try:
+        cls.add(channel, question, options)
+    except slack.SlackRateLimited:
+        # Slack shows the response text to whoever ran the command
+        return HttpResponse("Too many polls are being posted to this channel right now, "
+                            "please try again in a few seconds.")
 
     return HttpResponse()  # Empty 200 HTTP response, to not display any additional content in Slack
 
@@ -189,14 +207,14 @@ def view_poll(request: HttpRequest, poll_timestamp: str) -> HttpResponse:
 
 
 def view_vote_on_poll_form(request: HttpRequest, poll_timestamp: str) -> HttpResponse:
-    logger.info("vote_on_poll: Received a GET request")
+    logger.debug("vote_on_poll: Received a GET request")
     submitted_form = NameAndSecretForm(request.GET)
     if submitted_form.is_valid():
         poll = PollBase.timestamped(poll_timestamp)
         user_name = submitted_form.cleaned_data['user_name']
         user_secret = submitted_form.cleaned_data['user_secret']
         user = User.find_or_create(user_name)
-        vote = poll.all_votes.get(user, None)
+        vote = poll.get_user_vote(user)
         if vote is None:
             vote = poll.FullVoteType.find_and_validate_or_create_verified(poll, user,
                                                                           user_secret)
@@ -208,53 +226,65 @@ def view_vote_on_poll_form(request: HttpRequest, poll_timestamp: str) -> HttpRes
 
 
 def add_poll_option(request: HttpRequest, poll_timestamp: str) -> HttpResponse:
-    logger.info("vote_on_poll: method is 'addoption'")
-    poll = PollBase.timestamped(poll_timestamp)
+    logger.debug("vote_on_poll: method is 'addoption'")
     option = request.POST['option']
     if option is None:
         return HttpResponseBadRequest()
     else:
         option = option.strip()
-        if option in poll.options or len(option) == 0:
+        if len(option) == 0 or len(option) > OPTION_MAX_LENGTH:
+            return HttpResponseBadRequest()
+        try:
+            _, added = PollBase.append_option(poll_timestamp, option)
+        except ValueError:
+            return HttpResponseBadRequest()
+        if not added:
             return HttpResponseBadRequest()
         else:
-            poll.options.append(option)
-            poll.save()
             return redirect(request.POST['next'])
 
 
 def submit_vote_on_poll(request: HttpRequest, poll_timestamp: str) -> HttpResponse:
-    logger.info("vote_on_poll: method is *vote")
+    logger.debug("vote_on_poll: method is *vote")
     if request.POST['_method'] == 'approvalvote':
         cls = FullApprovalVoteForm
     elif request.POST['_method'] == 'multivote':
         cls = FullMultiVoteForm
     else:
         return HttpResponseBadRequest()
-    submitted_form = cls(request.POST)
-    if submitted_form.is_valid():
-        logger.info("vote_on_poll: submitted_form is_valid")
-        if submitted_form.cleaned_data['poll'].timestamp_str == poll_timestamp:
-            logger.info("vote_on_poll: submitted_form has correct timestamp")
-            poll = submitted_form.cleaned_data['poll']
-            submitted_form.save()
-            logger.info("vote_on_poll: submitted_form saved")
-            return redirect(poll.get_absolute_url() + "results")
-        else:
-            raise SuspiciousOperation("Poll timestamp did not match what was submitted"
-                                      + "in the form.")
-    else:
-        logger.warning(f"Failed to clean submitted form: {submitted_form.cleaned_data} "
-                       + f"had errors {submitted_form.errors}")
+    data = request.POST
+    try:
+        submitted_timestamp = TimestampField.normalize_to_timestamp(data.get('poll', ''))
+    except ValueError:
+        submitted_timestamp = None
+    if submitted_timestamp is None \
+            or submitted_timestamp != TimestampField.normalize_to_timestamp(poll_timestamp):
+        raise SuspiciousOperation("Poll timestamp did not match what was submitted"
+                                  + "in the form.")
+    identity = NameAndSecretForm({'user_name': data.get('user'),
+                                  'user_secret': data.get('user_secret')})
+    if not identity.is_valid():
+        logs.log_event(logger, logging.WARNING, "invalid_vote_form",
+                       errors=identity.errors.get_json_data())
+        return HttpResponseBadRequest()
+    try:
+        vote = submit_vote(cls.vote_model, poll_timestamp, identity.cleaned_data['user_name'],
+                           identity.cleaned_data['user_secret'],
+                           lambda poll: cls.weights_from_data(data, len(poll.options)))
+    except ValidationError as e:
+        logs.log_event(logger, logging.WARNING, "invalid_vote_form", errors=e.messages)
         return HttpResponseBadRequest()
+    logger.debug("vote_on_poll: vote saved")
+    return redirect(vote.poll.get_absolute_url() + "results")
 
 
 def vote_on_poll(request: HttpRequest, poll_timestamp: str) -> HttpResponse:
-    logger.info(f"In view controller vote_on_poll({request}, '{poll_timestamp}')")
+    logs.log_request(logger, "vote_on_poll", {"method": request.method,
+                                              "poll": poll_timestamp}, logging.DEBUG)
     if request.method == "GET":
         return view_vote_on_poll_form(request, poll_timestamp)
     elif request.method == 'POST':
-        logger.info("vote_on_poll: Received a POST request")
+        logger.debug("vote_on_poll: Received a POST request")
         if request.POST['_method'] == "addoption":
             return add_poll_option(request, poll_timestamp)
         elif request.POST['_method'].endswith('vote'):
@@ -266,29 +296,133 @@ def vote_on_poll(request: HttpRequest, poll_timestamp: str) -> HttpResponse:
 
 
 LIST_SUFFIX = '_list'
+NoneType = type(None)
 RequestHandler = Callable[..., HttpResponse]
 
 
+@dataclass(frozen=True)
+class QueryArgument:
+    name: str
+    key: str
+    many: bool
+    convert: Callable[[str], Any]
+
+
+def _identity(value: str) -> str:
+    return value
+
+
+def _to_bool(value: str) -> bool:
+    return value != '' and value not in utils.FALSEY_VALUES
+
+
+def _query_converter(annotation: Any) -> Callable[[str], Any]:
+    # Unwraps Optional[...] and List[...] down to the type of a single query value
+    if getattr(annotation, '__origin__', None) in (Union, list, List):
+        inner = [arg for arg in annotation.__args__ if arg is not NoneType]
+        if len(inner) == 1:
+            return _query_converter(inner[0])
+    if annotation is bool:
+        return _to_bool
+    elif annotation in (int, float):
+        return cast(Callable[[str], Any], annotation)
+    return _identity
+
+
+@dataclass(frozen=True)
+class QuerySpec:
+    arguments: Tuple[QueryArgument, ...]
+    # Handlers taking **kwargs also get every other key of the query
+    accepts_any: bool
+    bound_keys: FrozenSet[str]
+
+    def bind(self, query_dict: QueryDict, kwargs: Dict[str, Any]) -> Optional[HttpResponse]:
+        # Fills kwargs from the query, or returns the 400 for a value that doesn't convert
+        for argument in self.arguments:
+            if argument.key not in query_dict:
+                continue
+            try:
+                if argument.many:
+                    kwargs[argument.name] = [argument.convert(value) for value
+                                             in query_dict.getlist(argument.key)]
+                else:
+                    kwargs[argument.name] = argument.convert(query_dict[argument.key])
+            except ValueError:
+                return HttpResponseBadRequest(f"400 Invalid value for {argument.key}")
+        if self.accepts_any:
+            for key in query_dict:
+                if key not in self.bound_keys and key not in kwargs:
+                    kwargs[key] = query_dict.get(key)
+        return None
+
+
+def compile_query_spec(handler: RequestHandler) -> QuerySpec:
+    hints = get_type_hints(handler)
+    arguments = []
+    accepts_any = False
+    for parameter in inspect.signature(handler).parameters.values():
+        if parameter.kind == inspect.Parameter.KEYWORD_ONLY:
+            many = parameter.name.endswith(LIST_SUFFIX)
+            key = parameter.name
+            if many:
+                key = key[:-len(LIST_SUFFIX)]
+            arguments.append(QueryArgument(parameter.name, key, many,
+                                           _query_converter(hints.get(parameter.name))))
+        elif parameter.kind == inspect.Parameter.VAR_KEYWORD:
+            accepts_any = True
+    return QuerySpec(tuple(arguments), accepts_any,
+                     frozenset(argument.key for argument in arguments))
+
+
 def query_dict_to_kwonlyargs(handler: RequestHandler) \
         -> RequestHandler:
-    _, _, varkw, _, kwonlyargs, _, _ = inspect.getfullargspec(handler)
+    # The signature is compiled once, each request only walks the handler's own arguments
+    # (plus the query's keys for handlers taking **kwargs) and shares no mutable state.
+    spec = compile_query_spec(handler)
 
+    @functools.wraps(handler)
     def wrapped(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
         query_dict = request.GET or request.POST
-        if query_dict is not None:
-            kwnames = kwonlyargs
-            if varkw is not None:
-                kwnames += request.GET.keys()
-            for kwname in kwnames:
-                if kwname in query_dict:
-                    if kwname.endswith(LIST_SUFFIX):
-                        kwargs[kwname] = query_dict.getlist(kwname[:-len(LIST_SUFFIX)])
-                    else:
-                        kwargs[kwname] = query_dict.get(kwname)
+        if query_dict:
+            error = spec.bind(query_dict, kwargs)
+            if error is not None:
+                return error
         return handler(request, *args, **kwargs)
     return wrapped
 
 
+def _poll_revision(request: HttpRequest, poll_timestamp: str) \
+        -> Optional[Tuple[int, datetime.datetime]]:
+    # Shared by the ETag and Last-Modified checks so the poll row is only read once
+    if not hasattr(request, '_poll_revision'):
+        setattr(request, '_poll_revision', PollBase.revision(poll_timestamp))
+    return getattr(request, '_poll_revision')
+
+
+def results_etag(request: HttpRequest, poll_timestamp: str, **kwargs: Any) -> Optional[str]:
+    revision = _poll_revision(request, poll_timestamp)
+    if revision is None:
+        return None
+    # The full path covers the view and its query, e.g. which system the results use
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()[:16]
+    return f"{revision[0]}-{path}"
+
+
+def results_last_modified(request: HttpRequest, poll_timestamp: str,
+                          **kwargs: Any) -> Optional[datetime.datetime]:
+    revision = _poll_revision(request, poll_timestamp)
+    if revision is None:
+        return None
+    return revision[1]
+
+
+# Caches may keep results but must revalidate, which is answered with a 304 from the poll row
+# alone while nothing has been voted on or added since.
+results_conditional = condition(etag_func=results_etag, last_modified_func=results_last_modified)
+
+
+@cache_control(public=True, no_cache=True)
+@results_conditional
 @query_dict_to_kwonlyargs
 def poll_results(request: HttpRequest, poll_timestamp: str, *,
                  system: Optional[str] = None) -> HttpResponse:
@@ -301,6 +435,8 @@ def poll_results(request: HttpRequest, poll_timestamp: str, *,
         return HttpResponseBadRequest()
 
 
+@cache_control(public=True, no_cache=True)
+@results_conditional
 @query_dict_to_kwonlyargs
 def poll_results_visualization(request: HttpRequest, poll_timestamp: str, *,
                                system: Optional[str] = None) -> HttpResponse:
@@ -317,3 +453,17 @@ def poll_results_visualization(request: HttpRequest, poll_timestamp: str, *,
             return response
     else:
         return HttpResponseBadRequest()
+
+
+@cache_control(public=True, no_cache=True)
+@results_conditional
+@query_dict_to_kwonlyargs
+def poll_results_comparison(request: HttpRequest, poll_timestamp: str, *,
+                            systems_list: Optional[List[str]] = None) -> HttpResponse:
+    if request.method == "GET":
+        poll = PollBase.timestamped(poll_timestamp)
+        systems = systems_list or list(poll.supported_systems)
+        return render(request, "poll_results_comparison.html",
+                      {'poll': poll, 'systems': systems, 'rows': poll.compare_systems(systems)})
+    else:
+        return HttpResponseBadRequest()
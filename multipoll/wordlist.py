@@ -0,0 +1,76 @@
+from __future__ import annotations  # noqa: T484
+
+import bisect
+import os
+import random
+import threading
+from typing import Dict, Iterable, List, Optional
+
+# Words for generated secrets, prebuilt from WordNet by `manage.py buildwordlist` so WordNet
+# itself is never loaded by the app. Read on first use.
+WORD_LIST_PATH = os.path.join(os.path.dirname(__file__), "data", "secretwords.txt")
+HEADER = "# Generated by manage.py buildwordlist, do not edit"
+
+
+class Words:
+    # Sorted by length, so the words up to a length are a prefix of the list
+    def __init__(self, words: Iterable[str]):
+        self.words = sorted(words, key=lambda w: (len(w), w))
+        self.lengths = [len(w) for w in self.words]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def choice(self, max_length: int, rng: random.Random) -> str:
+        count = bisect.bisect_right(self.lengths, max_length)
+        if count == 0:
+            raise ValueError(f"No words of at most {max_length} letters")
+        return self.words[rng.randrange(count)]
+
+
+class WordList:
+    def __init__(self, adjectives: Iterable[str], nouns: Iterable[str]):
+        self.adjectives = Words(adjectives)
+        self.nouns = Words(nouns)
+
+    @classmethod
+    def load(cls, path: str = WORD_LIST_PATH) -> WordList:
+        sections: Dict[str, List[str]] = {"adjectives": [], "nouns": []}
+        current: Optional[List[str]] = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                elif line.startswith("[") and line.endswith("]"):
+                    current = sections[line[1:-1]]
+                elif current is not None:
+                    current.append(line)
+        return cls(sections["adjectives"], sections["nouns"])
+
+    def save(self, path: str = WORD_LIST_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"{HEADER}\n")
+            for name, words in (("adjectives", self.adjectives), ("nouns", self.nouns)):
+                f.write(f"[{name}]\n")
+                f.writelines(f"{word}\n" for word in words.words)
+
+    def secret(self, max_word_length: int = 4, rng: Optional[random.Random] = None) -> str:
+        rng = rng or _random
+        return self.adjectives.choice(max_word_length, rng) + ' ' \
+            + self.nouns.choice(max_word_length, rng)
+
+
+_random = random.Random()
+_word_list: Optional[WordList] = None
+_word_list_lock = threading.Lock()
+
+
+def get_word_list() -> WordList:
+    global _word_list
+    if _word_list is None:
+        with _word_list_lock:
+            if _word_list is None:
+                _word_list = WordList.load()
+    return _word_list